@@ -0,0 +1,7 @@
+# ベンチマーク
+import os
+
+# .env が無くても実行できるようにダミーの秘密鍵を設定
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-for-local-runs-only")
+# 大量のリクエストを送信するため、レート制限は行わない
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
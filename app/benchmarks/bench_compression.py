@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.bench_search import WORDS
+from benchmarks.common import create_client, create_temp_engine, login, remove_temp_db
+from compression import SUPPORTED_ENCODINGS, CompressionMiddleware
+from init_database import migrate_db
+
+# ============================================
+# メモ一覧のレスポンス圧縮の比較(転送バイト数と1リクエストあたりのCPU時間)
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_compression --sizes 10 100 1000 --repeat 200
+# identity: 圧縮なし、それ以外は Accept-Encoding で指定した方式
+# cpu_ms はクライアント(httpx)の処理を含むプロセス全体のCPU時間
+# no_cache: 圧縮結果のキャッシュを使用しない場合(ETagが毎回異なる場合と同じ)
+# ============================================
+BATCH_SIZE = 1000
+
+
+# アプリのミドルウェアから CompressionMiddleware を取得
+def _find_compression(app) -> CompressionMiddleware:
+    node = app.middleware_stack
+    while not isinstance(node, CompressionMiddleware):
+        node = node.app
+    return node
+
+
+# 指定件数のメモを持つユーザーを作成
+async def create_user(client, username: str, size: int, rng: random.Random) -> dict:
+    await client.post(
+        "/auth/signup", json={"username": username, "password": "bench1234"}
+    )
+    headers = await login(client, username, "bench1234")
+    for start in range(0, size, BATCH_SIZE):
+        memos = [
+            {
+                "title": " ".join(rng.choices(WORDS, k=3)),
+                "description": " ".join(rng.choices(WORDS, k=12)),
+                "is_check": rng.random() < 0.5,
+            }
+            for _ in range(min(BATCH_SIZE, size - start))
+        ]
+        response = await client.post(
+            "/memos/batch", json={"memos": memos}, headers=headers
+        )
+        response.raise_for_status()
+    return headers
+
+
+async def run(args) -> dict:
+    engine, path = create_temp_engine()
+    rng = random.Random(0)
+    results = {}
+    try:
+        await migrate_db(engine)
+        async with create_client(engine) as client:
+            # ミドルウェアを構築させる
+            await client.get("/metrics")
+            compression = _find_compression(client._transport.app)
+            for size in args.sizes:
+                headers = await create_user(client, f"size{size}", size, rng)
+                results[size] = {}
+                for encoding in ("identity", *SUPPORTED_ENCODINGS):
+                    for use_cache in (True, False):
+                        if encoding == "identity" and not use_cache:
+                            continue
+                        request_headers = headers | {"Accept-Encoding": encoding}
+                        wire_bytes = 0
+                        cpu_start = time.process_time()
+                        for _ in range(args.repeat):
+                            if not use_cache:
+                                compression.cache.clear()
+                            response = await client.get(
+                                "/memos/", headers=request_headers
+                            )
+                            wire_bytes = response.num_bytes_downloaded
+                        cpu_ms = (time.process_time() - cpu_start) * 1000 / args.repeat
+                        name = encoding if use_cache else f"{encoding}_no_cache"
+                        results[size][name] = {
+                            "bytes": wire_bytes,
+                            "cpu_ms": round(cpu_ms, 3),
+                        }
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
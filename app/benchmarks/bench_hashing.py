@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+
+from sqlalchemy import update
+
+import hashing
+from benchmarks.common import (
+    create_client,
+    create_temp_engine,
+    login,
+    remove_temp_db,
+    seed,
+    summarize,
+)
+from config import get_settings
+from init_database import migrate_db
+from models.auth import User
+
+
+# ============================================
+# ログインとメモ一覧取得を同時に実行し、ハッシュ化の実行方式ごとに遅延を比較
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_hashing --iterations 100000 --duration 5
+# ============================================
+PASSWORD = "benchmark-password"
+
+
+# 指定時間、同じ処理を繰り返して遅延を記録
+async def _loop(func, deadline: float, samples: list[float]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def run_mode(
+    engine, mode: str, users: int, logins: int, readers: int, duration: float
+) -> dict:
+    # 実行方式を切り替え(ワーカープールは次回使用時に再作成)
+    hashing.shutdown_executor()
+    get_settings().password_hash_executor = mode
+
+    async with create_client(engine) as client:
+        headers = await login(client, "user1", PASSWORD)
+
+        async def do_login():
+            await login(
+                client, f"user{int(time.perf_counter() * 1000) % users + 1}", PASSWORD
+            )
+
+        async def do_read():
+            response = await client.get("/memos/", headers=headers)
+            response.raise_for_status()
+
+        login_samples: list[float] = []
+        read_samples: list[float] = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(_loop(do_login, deadline, login_samples) for _ in range(logins)),
+            *(_loop(do_read, deadline, read_samples) for _ in range(readers)),
+        )
+    hashing.shutdown_executor()
+    return {"login": summarize(login_samples), "memo_list": summarize(read_samples)}
+
+
+async def run(args) -> dict:
+    hashing.PBKDF2_ITERATIONS = args.iterations
+    engine, path = create_temp_engine()
+    try:
+        await migrate_db(engine)
+        await seed(engine, args.users, args.memos)
+        # 全ユーザーのパスワードを同じ値に設定
+        salt = base64.b64encode(os.urandom(32))
+        password = hashing._pbkdf2(PASSWORD, salt, args.iterations)
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(User).values(password=password, salt=salt.decode())
+            )
+
+        results = {"iterations": args.iterations}
+        for mode in args.modes:
+            results[mode] = await run_mode(
+                engine, mode, args.users, args.logins, args.readers, args.duration
+            )
+        return results
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--memos", type=int, default=5_000)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--logins", type=int, default=4, help="同時ログイン数")
+    parser.add_argument("--readers", type=int, default=8, help="同時メモ取得数")
+    parser.add_argument("--duration", type=float, default=5.0, help="計測秒数")
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import json
+import random
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import cruds.memo as memo_crud
+import init_database
+from benchmarks.common import create_temp_engine, measure, remove_temp_db, seed
+from models.auth import User
+from models.memo import Memo
+
+
+# ============================================
+# インデックス有無による一覧取得・ログイン検索の比較
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_indexes --users 10000 --memos 1000000
+# ============================================
+async def run(users: int, memos: int, repeat: int) -> dict:
+    engine, path = create_temp_engine()
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        # インデックス無しのテーブルを作成してデータ投入
+        async with engine.begin() as conn:
+            await conn.run_sync(init_database._create_tables)
+            for table in (User.__table__, Memo.__table__):
+                for index in table.indexes:
+                    await conn.run_sync(index.drop)
+        await seed(engine, users, memos)
+
+        async def list_memos():
+            async with session_factory() as session:
+                await memo_crud.get_memos_by_user_id(session, random.randint(1, users))
+
+        # ログイン時と同じ列を取得(user_cache を経由せず、毎回DBを検索する)
+        async def find_user():
+            async with session_factory() as session:
+                await session.execute(
+                    select(User.user_id, User.password, User.salt).where(
+                        User.username == f"user{random.randint(1, users)}"
+                    )
+                )
+
+        results = {"users": users, "memos": memos}
+        results["without_index"] = {
+            "list": await measure(list_memos, repeat),
+            "login_lookup": await measure(find_user, repeat),
+        }
+        # マイグレーションでインデックスを作成
+        await init_database.migrate_db(engine)
+        results["with_index"] = {
+            "list": await measure(list_memos, repeat),
+            "login_lookup": await measure(find_user, repeat),
+        }
+        return results
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--memos", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.users, args.memos, args.repeat)), indent=2))
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+import log
+from benchmarks.common import (
+    create_client,
+    create_temp_engine,
+    login,
+    remove_temp_db,
+    summarize,
+)
+from config import get_settings
+from init_database import migrate_db
+
+
+# ============================================
+# ログ設定ごとのスループット比較
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_logging --requests 2000
+# sync_debug_sql は変更前(print + echo=True)相当の出力量を同期的に書き込む
+# ============================================
+# 同期的に出力する設定(変更前相当)
+def _setup_sync_logging(stream):
+    log.shutdown_logging()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(logging.StreamHandler(stream))
+    root.setLevel(logging.DEBUG)
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+
+async def run_profile(name: str, args, stream) -> dict:
+    settings = get_settings()
+    if name == "sync_debug_sql":
+        _setup_sync_logging(stream)
+    else:
+        logging.getLogger().handlers.clear()
+        profile = settings.model_copy(
+            update=(
+                {"log_level": "DEBUG", "sql_log_sample_rate": 1.0}
+                if name == "queue_debug_sql"
+                else {"log_level": "INFO", "sql_log_sample_rate": 0.0}
+            )
+        )
+        log.setup_logging(profile, stream)
+
+    engine, path = create_temp_engine()
+    try:
+        await migrate_db(engine)
+        async with create_client(engine) as client:
+            await client.post(
+                "/auth/signup", json={"username": "benchmark", "password": "benchmark"}
+            )
+            headers = await login(client, "benchmark", "benchmark")
+
+            async def request(i: int):
+                # 書き込み1回につき読み込み4回
+                if i % 5 == 0:
+                    await client.post(
+                        "/memos/", json={"title": f"m{i}"}, headers=headers
+                    )
+                else:
+                    await client.get("/memos/?limit=20", headers=headers)
+
+            samples: list[float] = []
+            start = time.perf_counter()
+            for offset in range(0, args.requests, args.concurrency):
+
+                async def timed(i: int):
+                    begin = time.perf_counter()
+                    await request(i)
+                    samples.append((time.perf_counter() - begin) * 1000)
+
+                await asyncio.gather(
+                    *(
+                        timed(i)
+                        for i in range(
+                            offset, min(offset + args.concurrency, args.requests)
+                        )
+                    )
+                )
+            elapsed = time.perf_counter() - start
+        return {"rps": round(len(samples) / elapsed, 1), "latency": summarize(samples)}
+    finally:
+        log.shutdown_logging()
+        logging.getLogger().handlers.clear()
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+async def run(args) -> dict:
+    results = {}
+    with tempfile.TemporaryFile("w") as stream:
+        for name in ("sync_debug_sql", "queue_debug_sql", "default"):
+            results[name] = await run_profile(name, args, stream)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import json
+import time
+
+import metrics
+
+
+# ============================================
+# メトリクス計測のオーバーヘッド
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_metrics --calls 200000
+# 何もしないASGIアプリを直接呼んだ場合とミドルウェア経由で呼んだ場合の差を測定
+# ============================================
+class _Route:
+    path = "/memos/{memo_id}"
+
+
+async def _noop_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _send(message):
+    pass
+
+
+async def measure_calls(app, calls: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/memos/1"}
+    start = time.perf_counter()
+    for _ in range(calls):
+        await app(dict(scope), _receive, _send)
+    return time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    wrapped = metrics.MetricsMiddleware(_noop_app)
+    # ウォームアップ
+    await measure_calls(_noop_app, 1_000)
+    await measure_calls(wrapped, 1_000)
+    bare = await measure_calls(_noop_app, args.calls)
+    measured = await measure_calls(wrapped, args.calls)
+    return {
+        "calls": args.calls,
+        "bare_us_per_call": round(bare / args.calls * 1e6, 3),
+        "middleware_us_per_call": round(measured / args.calls * 1e6, 3),
+        "overhead_us_per_call": round((measured - bare) / args.calls * 1e6, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import (
+    create_client,
+    create_temp_engine,
+    login,
+    remove_temp_db,
+    summarize,
+)
+from init_database import migrate_db
+
+
+# ============================================
+# 更新・削除1リクエストあたりのSQL発行数と処理時間の計測
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_queries --requests 500
+# 監査ログの書き込みは、起動処理(lifespan)を実行しない本計測ではリクエストごとに実行されるが、
+# 通常はジョブキューで複数リクエスト分をまとめて書き込むため、別に数える
+# ============================================
+async def run(requests: int) -> dict:
+    engine, path = create_temp_engine()
+    counter = {"queries": 0, "audit_queries": 0}
+
+    def count_query(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO audit_logs"):
+            counter["audit_queries"] += 1
+        else:
+            counter["queries"] += 1
+
+    try:
+        await migrate_db(engine)
+        async with create_client(engine) as client:
+            await client.post(
+                "/auth/signup",
+                json={"username": "benchmark", "password": "benchmark"},
+            )
+            headers = await login(client, "benchmark", "benchmark")
+            for i in range(requests):
+                await client.post(
+                    "/memos/", json={"title": f"memo{i}"}, headers=headers
+                )
+            memo_ids = [
+                m["memo_id"]
+                for m in (await client.get("/memos/", headers=headers)).json()
+            ]
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+            results = {}
+            for name, send in (
+                (
+                    "update",
+                    lambda memo_id: client.put(
+                        f"/memos/{memo_id}",
+                        json={"title": "updated", "is_check": True},
+                        headers=headers,
+                    ),
+                ),
+                (
+                    "delete",
+                    lambda memo_id: client.delete(f"/memos/{memo_id}", headers=headers),
+                ),
+            ):
+                counter["queries"] = counter["audit_queries"] = 0
+                samples = []
+                for memo_id in memo_ids:
+                    start = time.perf_counter()
+                    response = await send(memo_id)
+                    samples.append((time.perf_counter() - start) * 1000)
+                    response.raise_for_status()
+                results[name] = {
+                    "queries_per_request": counter["queries"] / len(memo_ids),
+                    "audit_queries_per_request": counter["audit_queries"]
+                    / len(memo_ids),
+                    "latency": summarize(samples),
+                }
+            return results
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
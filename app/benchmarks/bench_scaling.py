@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+from benchmarks.common import create_temp_engine, remove_temp_db, seed
+from benchmarks.load_test import PASSWORD, SCENARIOS, run_http, start_server
+from init_database import migrate_db
+
+# ============================================
+# ワーカー数によるスループットの変化(serve.py で 1〜N ワーカーを起動)
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_scaling --workers 1 2 4 --scenarios list mixed
+#   python -m benchmarks.bench_scaling --shared-state memory  # 共有状態をワーカーごとにした場合
+# ワーカー数ごとに新しいDBをシードし、load_test と同じシナリオで RPS を計測する
+# speedup: 1ワーカー(最初の指定)に対するRPSの倍率、efficiency: speedup / ワーカー数
+# クライアント(このプロセス)も同じマシンのCPUを使用するため、CPU数より少ない
+# ワーカー数までの比較が目安になる
+# ============================================
+
+
+async def run_workers(workers: int, args) -> dict:
+    engine, path = create_temp_engine()
+    try:
+        await migrate_db(engine)
+        await seed(engine, args.users, args.memos, password=PASSWORD)
+        await engine.dispose()
+        process, base_url = await start_server(path, workers, args.shared_state)
+        try:
+            return await run_http(base_url, args)
+        finally:
+            process.terminate()
+            process.wait()
+    finally:
+        remove_temp_db(path)
+
+
+async def run(args) -> dict:
+    results = {}
+    for workers in args.workers:
+        print(f">>> workers={workers}", file=sys.stderr)
+        results[workers] = await run_workers(workers, args)
+
+    base_workers = args.workers[0]
+    scaling = {}
+    for scenario in args.scenarios:
+        base_rps = results[base_workers][scenario]["rps"]
+        scaling[scenario] = {
+            workers: {
+                "rps": result[scenario]["rps"],
+                "p95_ms": result[scenario].get("p95_ms"),
+                "errors": result[scenario]["errors"],
+                "speedup": round(result[scenario]["rps"] / base_rps, 2),
+                "efficiency": round(
+                    result[scenario]["rps"] / base_rps / (workers / base_workers), 2
+                ),
+            }
+            for workers, result in results.items()
+        }
+    return {
+        "config": {
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "shared_state": args.shared_state,
+            "users": args.users,
+            "memos": args.memos,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        },
+        "scaling": scaling,
+    }
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, *(n for n in (2, 4, 8) if n <= cpu_count), cpu_count})
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument(
+        "--shared-state", choices=("auto", "memory", "redis", "local"), default="auto"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--memos", type=int, default=20_000)
+    parser.add_argument(
+        "--login-users", type=int, default=100, help="リクエストを送るユーザー数"
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5, help="シナリオごとの秒数")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=["list", "mixed"]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
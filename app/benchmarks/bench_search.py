@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import cruds.memo as memo_crud
+from benchmarks.common import create_temp_engine, measure, remove_temp_db, seed
+from init_database import migrate_db
+from models.memo import Memo
+
+# ============================================
+# 全文検索(FTS5)とLIKEによる検索の比較
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_search --memos 1000000 --users 100
+# fts は関連度順、like はmemo_id順に limit 件見つかった時点で終了する
+# ============================================
+# メモの本文に使用する語(出現頻度が偏るよう、先頭ほど多く出現させる)
+WORDS = [
+    "会議",
+    "買い物",
+    "meeting",
+    "report",
+    "アジェンダ",
+    "project",
+    "牛乳",
+    "review",
+    "deadline",
+    "invoice",
+    "travel",
+    "dentist",
+    "birthday",
+    "refactor",
+    "quarterly",
+    "マイルストーン",
+]
+# 一度にINSERTする件数
+BATCH_SIZE = 50_000
+
+
+def _random_text(rng: random.Random, words: int) -> str:
+    return (
+        " ".join(
+            WORDS[min(int(rng.expovariate(0.3)), len(WORDS) - 1)] for _ in range(words)
+        )
+        + f" {rng.randrange(1_000_000):06d}"
+    )
+
+
+async def seed_memos(engine, users: int, memos: int):
+    rng = random.Random(0)
+    now = datetime.now()
+    await seed(engine, users, 0)
+    async with engine.begin() as conn:
+        for start in range(0, memos, BATCH_SIZE):
+            await conn.execute(
+                insert(Memo.__table__),
+                [
+                    {
+                        "title": _random_text(rng, 2),
+                        "description": _random_text(rng, 6),
+                        "is_check": False,
+                        "user_id": i % users + 1,
+                        "created_at": now,
+                    }
+                    for i in range(start, min(start + BATCH_SIZE, memos))
+                ],
+            )
+
+
+async def run(args) -> dict:
+    engine, path = create_temp_engine()
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        await migrate_db(engine)
+        start = time.perf_counter()
+        # 登録時にトリガーで全文検索の索引も更新される
+        await seed_memos(engine, args.users, args.memos)
+        results = {"seed_seconds": round(time.perf_counter() - start, 1)}
+
+        async with session_factory() as session:
+            for query in ("会議 meeting", "dentist", "マイルストーン", "012345"):
+                terms = query.split()
+
+                async def fts():
+                    await memo_crud.search_memos(session, 1, query, args.limit)
+
+                async def like():
+                    await session.execute(
+                        memo_crud._select_memos_like(1, terms).limit(args.limit)
+                    )
+
+                results[query] = {
+                    "fts": await measure(fts, args.repeat),
+                    "like": await measure(like, args.repeat),
+                }
+        return results
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memos", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import cruds.memo as memo_crud
+from benchmarks.common import create_temp_engine, measure, remove_temp_db, seed
+from init_database import migrate_db
+from models.memo import Memo
+from schemas.memo import MemoSchema
+
+
+# ============================================
+# メモ一覧のJSON変換の処理時間の比較(serialize: 変換のみ, fetch+serialize: DBからの取得を含む)
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_serialization --memos 1000
+# orm_response_model: ORMのモデル -> response_model(検証・変換) -> JSONResponse(変更前)
+# rows_type_adapter: 行(タプル) -> TypeAdapterで検証 -> JSON(既定)
+# rows_trusted: 行(タプル) -> 検証せずにJSON(MEMO_FAST_SERIALIZATION=true)
+# ============================================
+async def run(args) -> dict:
+    engine, path = create_temp_engine()
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    field = create_model_field(
+        name="response", type_=list[MemoSchema], mode="serialization"
+    )
+    try:
+        await migrate_db(engine)
+        await seed(engine, users=1, memos=args.memos)
+        async with session_factory() as session:
+            memos = (await session.scalars(select(Memo))).all()
+            rows = await memo_crud.get_memos_by_user_id(session, 1)
+            adapter = memo_crud._memo_list_adapter
+
+            # JSON変換のみ
+            async def orm_response_model():
+                content = await serialize_response(
+                    field=field, response_content=memos, is_coroutine=True
+                )
+                JSONResponse(content)
+
+            async def rows_type_adapter():
+                adapter.dump_json(
+                    adapter.validate_python(memo_crud._rows_to_dicts(rows))
+                )
+
+            async def rows_trusted():
+                memo_crud.dump_memo_list_json(rows)
+
+            # DBからの取得 + JSON変換
+            async def fetch_orm_response_model():
+                session.expunge_all()
+                content = await serialize_response(
+                    field=field,
+                    response_content=(await session.scalars(select(Memo))).all(),
+                    is_coroutine=True,
+                )
+                JSONResponse(content)
+
+            async def fetch_rows_trusted():
+                memo_crud.dump_memo_list_json(
+                    await memo_crud.get_memos_by_user_id(session, 1)
+                )
+
+            results = {}
+            for name, func in (
+                ("serialize/orm_response_model", orm_response_model),
+                ("serialize/rows_type_adapter", rows_type_adapter),
+                ("serialize/rows_trusted", rows_trusted),
+                ("fetch+serialize/orm_response_model", fetch_orm_response_model),
+                ("fetch+serialize/rows_trusted", fetch_rows_trusted),
+            ):
+                # ウォームアップ
+                await func()
+                results[name] = await measure(func, args.repeat)
+        return results
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--memos", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    print(json.dumps(asyncio.run(run(parser.parse_args())), indent=2))
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import create_temp_engine, remove_temp_db, seed
+from init_database import migrate_db
+
+# ============================================
+# インポート・起動処理の所要時間(コールドスタート)
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.bench_startup --repeat 5
+#   python -m benchmarks.bench_startup --import-budget-ms 800  # 超えた場合は終了コード1
+# 毎回新しいプロセスで計測する(モジュールのキャッシュが無い状態)
+# import_ms: import main の時間
+# startup_ms: 起動処理(lifespan)の時間、steps はその内訳(startup.state.timings)
+# first_*_ms: 起動処理の後、最初のログイン・メモ一覧取得の時間
+# ============================================
+# シードしたユーザーのパスワード
+PASSWORD = "benchmark"
+
+# 計測用の子プロセスで実行するスクリプト(結果をJSONで出力)
+CHILD_SCRIPT = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+
+async def run():
+    import httpx
+    import startup
+    app = main.app
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        startup_ms = (time.perf_counter() - start) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            start = time.perf_counter()
+            response = await client.post(
+                "/auth/login", data={"username": "user1", "password": %r}
+            )
+            first_login_ms = (time.perf_counter() - start) * 1000
+            headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+            start = time.perf_counter()
+            (await client.get("/memos/", headers=headers)).raise_for_status()
+            first_list_ms = (time.perf_counter() - start) * 1000
+            ready = (await client.get("/readyz")).status_code == 200
+    return {
+        "import_ms": import_ms,
+        "startup_ms": startup_ms,
+        "first_login_ms": first_login_ms,
+        "first_list_ms": first_list_ms,
+        "ready": ready,
+        "steps": startup.state.timings,
+    }
+
+print(json.dumps(asyncio.run(run())))
+""" % (
+    PASSWORD,
+)
+
+# 予算と比較する項目(項目, コマンドライン引数の名前)
+BUDGET_METRICS = (
+    ("import_ms", "import_budget_ms"),
+    ("startup_ms", "startup_budget_ms"),
+)
+
+
+def run_child(db_path: str) -> dict:
+    env = os.environ | {
+        "DATABASE_URL": "sqlite+aiosqlite:///" + db_path,
+        "LOG_LEVEL": "WARNING",
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def prepare_db(engine, args):
+    await migrate_db(engine)
+    await seed(engine, 1, args.memos, password=PASSWORD)
+    await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--memos", type=int, default=100, help="ユーザーのメモ件数")
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--startup-budget-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    engine, path = create_temp_engine()
+    try:
+        asyncio.run(prepare_db(engine, args))
+        runs = [run_child(path) for _ in range(args.repeat)]
+    finally:
+        remove_temp_db(path)
+
+    # 中央値で比較(1回目はOSのファイルキャッシュの影響を受けやすいため)
+    report = {
+        metric: round(statistics.median(run[metric] for run in runs), 2)
+        for metric in ("import_ms", "startup_ms", "first_login_ms", "first_list_ms")
+    }
+    report["ready"] = all(run["ready"] for run in runs)
+    report["steps"] = {
+        step: round(statistics.median(run["steps"][step] for run in runs), 2)
+        for step in runs[0]["steps"]
+    }
+    report["budget"] = {
+        metric: {
+            "budget": getattr(args, name),
+            "current": report[metric],
+            "over": report[metric] > getattr(args, name),
+        }
+        for metric, name in BUDGET_METRICS
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    over = any(item["over"] for item in report["budget"].values())
+    return 1 if over or not report["ready"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+
+from benchmarks.common import create_temp_engine, remove_temp_db
+
+# ============================================
+# メモ一覧キャッシュの整合性確認(書き込み直後に古い一覧を返さないこと)
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.check_cache_consistency
+#   python -m benchmarks.check_cache_consistency --backends memory
+# キャッシュのバックエンドごとに新しいプロセス・DBで、起動処理(lifespan)を実行したアプリに
+# 一覧取得 → 登録・更新・削除(一括処理・インポートを含む) → 一覧取得 を行い、
+# 変更が反映されていること、以前のETagで304を返さないことを確認する
+# redis はローカル用のRedis互換サーバー(state_server.py)を起動して使用し、
+# 別のワーカーから見た世代番号も変わることを確認する
+# 失敗した項目がある場合は終了コード1で終了
+# ============================================
+USERNAME = "consistency"
+PASSWORD = "consistency"
+
+
+class Checker:
+    def __init__(self, client, headers: dict):
+        self.client = client
+        self.headers = headers
+        self.failures: list[str] = []
+        self.count = 0
+
+    def check(self, name: str, ok: bool, detail: str = ""):
+        self.count += 1
+        if not ok:
+            self.failures.append(f"{name}: {detail}")
+
+    # 一覧取得(タイトルの集合, ETag)
+    async def titles(self) -> tuple[set[str], str]:
+        response = await self.client.get("/memos/", headers=self.headers)
+        response.raise_for_status()
+        return {memo["title"] for memo in response.json()}, response.headers["ETag"]
+
+    async def memo_id(self, title: str) -> int:
+        response = await self.client.get("/memos/", headers=self.headers)
+        return next(m["memo_id"] for m in response.json() if m["title"] == title)
+
+    async def write_and_check(
+        self, name: str, write, present: set[str], absent: set[str] = frozenset()
+    ):
+        """
+        一覧をキャッシュさせてから書き込み、直後の一覧に反映されているか確認する
+        Args:
+            name(str): 項目名
+            write: 書き込みを行う関数(レスポンスを返す)
+            present(set[str]): 書き込み後の一覧に含まれるタイトル
+            absent(set[str]): 書き込み後の一覧に含まれないタイトル
+        """
+        await self.titles()
+        _, etag = await self.titles()
+        response = await write()
+        self.check(f"{name} status", response.is_success, str(response.status_code))
+        titles, new_etag = await self.titles()
+        self.check(
+            f"{name} list",
+            present <= titles and not absent & titles,
+            f"present={sorted(present - titles)} absent={sorted(absent & titles)}",
+        )
+        self.check(f"{name} etag", new_etag != etag, etag)
+        response = await self.client.get(
+            "/memos/", headers={**self.headers, "If-None-Match": etag}
+        )
+        self.check(f"{name} if-none-match", response.status_code == 200, etag)
+
+
+async def run_scenario(checker: Checker):
+    client, headers = checker.client, checker.headers
+
+    async def create():
+        return await client.post(
+            "/memos/", json={"title": "created", "description": ""}, headers=headers
+        )
+
+    await checker.write_and_check("create", create, {"created"})
+
+    memo_id = await checker.memo_id("created")
+
+    async def update():
+        return await client.put(
+            f"/memos/{memo_id}",
+            json={"title": "updated", "description": "", "is_check": True},
+            headers=headers,
+        )
+
+    await checker.write_and_check("update", update, {"updated"}, {"created"})
+
+    async def delete():
+        return await client.delete(f"/memos/{memo_id}", headers=headers)
+
+    await checker.write_and_check("delete", delete, set(), {"updated"})
+
+    async def batch_create():
+        return await client.post(
+            "/memos/batch",
+            json={"memos": [{"title": "batch1"}, {"title": "batch2"}]},
+            headers=headers,
+        )
+
+    await checker.write_and_check("batch create", batch_create, {"batch1", "batch2"})
+
+    batch_ids = [await checker.memo_id("batch1"), await checker.memo_id("batch2")]
+
+    async def batch_update():
+        return await client.patch(
+            "/memos/batch",
+            json={"memos": [{"memo_id": batch_ids[0], "title": "batch1-updated"}]},
+            headers=headers,
+        )
+
+    await checker.write_and_check(
+        "batch update", batch_update, {"batch1-updated"}, {"batch1"}
+    )
+
+    # 同じメモを複数回指定した場合は、項目ごとにリクエストの後の値になること
+    async def batch_update_duplicate():
+        return await client.patch(
+            "/memos/batch",
+            json={
+                "memos": [
+                    {"memo_id": batch_ids[1], "title": "dup-A"},
+                    {"memo_id": batch_ids[1], "title": "dup-B", "is_check": True},
+                    {"memo_id": batch_ids[1], "title": "dup-C"},
+                ]
+            },
+            headers=headers,
+        )
+
+    await checker.write_and_check(
+        "batch update duplicate",
+        batch_update_duplicate,
+        {"dup-C"},
+        {"batch2", "dup-A", "dup-B"},
+    )
+    response = await client.get(f"/memos/{batch_ids[1]}", headers=headers)
+    checker.check(
+        "batch update duplicate is_check",
+        response.json().get("is_check") is True,
+        response.text,
+    )
+
+    async def batch_delete():
+        return await client.request(
+            "DELETE", "/memos/batch", json={"memo_ids": batch_ids}, headers=headers
+        )
+
+    await checker.write_and_check(
+        "batch delete", batch_delete, set(), {"batch1-updated", "dup-C"}
+    )
+
+    async def import_memos():
+        return await client.post(
+            "/memos/import?format=ndjson",
+            content=b'{"title":"imported1"}\n{"title":"imported2"}\n',
+            headers=headers,
+        )
+
+    await checker.write_and_check("import", import_memos, {"imported1", "imported2"})
+
+
+# 別のワーカーから見た世代番号(同じRedis互換サーバーに接続した別のバックエンド)
+async def check_other_worker(checker: Checker, user_id: int):
+    import cruds.memo as memo_crud
+    from cache import create_cache_backend
+
+    other = create_cache_backend("redis", maxsize=0, ttl=None, namespace="memo_list")
+    key = f"version:{user_id}"
+    before = await other.get_counter(key)
+    response = await checker.client.post(
+        "/memos/", json={"title": "other-worker"}, headers=checker.headers
+    )
+    response.raise_for_status()
+    after = await other.get_counter(key)
+    own = await memo_crud.memo_list_cache.get_counter(key)
+    checker.check(
+        "other worker version",
+        after != before and after == own,
+        f"before={before} after={after} own={own}",
+    )
+
+
+# 子プロセスで実行(環境変数でDB・バックエンドを指定済み)
+async def run_child() -> int:
+    import httpx
+
+    import db
+    from init_database import migrate_db
+    from main import app
+
+    await migrate_db()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://consistency"
+        ) as client:
+            await client.post(
+                "/auth/signup", json={"username": USERNAME, "password": PASSWORD}
+            )
+            response = await client.post(
+                "/auth/login", data={"username": USERNAME, "password": PASSWORD}
+            )
+            response.raise_for_status()
+            headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+            checker = Checker(client, headers)
+            await run_scenario(checker)
+            if os.environ.get("SHARED_STATE_BACKEND") == "redis":
+                user_id = (await client.get("/memos/", headers=headers)).json()[0][
+                    "user_id"
+                ]
+                await check_other_worker(checker, user_id)
+    await db.dispose_engine()
+
+    for failure in checker.failures:
+        print("NG " + failure)
+    print(f"{checker.count - len(checker.failures)}/{checker.count} OK")
+    return 1 if checker.failures else 0
+
+
+def run_backend(backend: str) -> bool:
+    env = os.environ | {"LOG_LEVEL": "WARNING", "SHARED_STATE_BACKEND": backend}
+    if backend == "redis":
+        from serve import start_state_server
+
+        env["REDIS_URL"] = start_state_server()
+    engine, path = create_temp_engine()
+    asyncio.run(engine.dispose())
+    try:
+        env["DATABASE_URL"] = "sqlite+aiosqlite:///" + path
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.check_cache_consistency", "--child"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        remove_temp_db(path)
+    print(f"[{backend}]")
+    print(result.stdout.strip())
+    if result.returncode != 0 and result.stderr:
+        print(result.stderr.strip())
+    return result.returncode == 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=("memory", "redis"),
+        default=["memory", "redis"],
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return asyncio.run(run_child())
+    results = [run_backend(backend) for backend in args.backends]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from benchmarks.common import create_temp_engine, remove_temp_db, seed
+from cruds.memo import _select_memos_by_user_id, _select_memos_search
+from init_database import migrate_db
+from schemas.memo import MemoListQuerySchema
+
+# ============================================
+# メモ一覧の絞り込み・並べ替え、検索のクエリプラン確認
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.check_query_plans
+# 全ての条件の組み合わせ(1ページ分を取得するクエリ)と検索(全文検索・LIKE)で、
+# memosを全件走査(SCAN)していないこと、
+# 並べ替えに一時的なソート(USE TEMP B-TREE FOR ORDER BY)を行っていないことを確認する
+# 該当する組み合わせがある場合は終了コード1で終了
+# ============================================
+FILTERS = {
+    "is_check": {"is_check": False},
+    "created": {
+        "created_from": datetime(2024, 1, 1),
+        "created_to": datetime(2025, 1, 1),
+    },
+    "updated": {
+        "updated_from": datetime(2024, 1, 1),
+        "updated_to": datetime(2025, 1, 1),
+    },
+}
+
+# 1ページの件数
+PAGE_SIZE = 100
+
+# 検索語(3文字以上: 全文検索、3文字未満を含む: LIKE)
+SEARCH_TERMS = (["memo"], ["memo", "benchmark"], ["me"], ["memo", "be"])
+
+
+# クエリプランの取得(各行の detail)
+def _explain(conn, stmt) -> list[str]:
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = tuple(
+        value.isoformat(" ") if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params)
+    return [row[-1] for row in rows]
+
+
+# クエリプランの問題点(全件走査・一時的なソート)
+def _problems(plan: list[str]) -> list[str]:
+    problems = []
+    if any(line.startswith("SCAN memos ") or line == "SCAN memos" for line in plan):
+        problems.append("SCAN")
+    if any(line.startswith("USE TEMP B-TREE FOR ORDER BY") for line in plan):
+        problems.append("TEMP B-TREE")
+    return problems
+
+
+def check_plans(conn) -> list[dict]:
+    dialect = conn.dialect.name
+    results = []
+    for count in range(len(FILTERS) + 1):
+        for names in itertools.combinations(FILTERS, count):
+            for sort, order, after in itertools.product(
+                ("memo_id", "created_at", "updated_at", "title"),
+                ("asc", "desc"),
+                (None, 1),
+            ):
+                conditions = {k: v for name in names for k, v in FILTERS[name].items()}
+                list_query = MemoListQuerySchema(sort=sort, order=order, **conditions)
+                stmt = _select_memos_by_user_id(dialect, 1, after, list_query)
+                plan = _explain(conn, stmt.limit(PAGE_SIZE))
+                results.append(
+                    {
+                        "query": f"list filters={'+'.join(names) or '-'} "
+                        f"sort={sort} {order} after={after}",
+                        "problems": _problems(plan),
+                        "plan": plan,
+                    }
+                )
+    for terms in SEARCH_TERMS:
+        stmt = _select_memos_search(dialect, 1, terms)
+        plan = _explain(conn, stmt.limit(PAGE_SIZE).offset(PAGE_SIZE))
+        results.append(
+            {
+                "query": f"search q={' '.join(terms)}",
+                "problems": _problems(plan),
+                "plan": plan,
+            }
+        )
+    return results
+
+
+async def run() -> bool:
+    engine, path = create_temp_engine()
+    try:
+        await migrate_db(engine)
+        await seed(engine, users=100, memos=10_000)
+        async with engine.connect() as conn:
+            # インデックスの統計情報を作成(本番に近いプランにする)
+            await conn.execute(text("ANALYZE"))
+            results = await conn.run_sync(check_plans)
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+    failed = [result for result in results if result["problems"]]
+    for result in failed:
+        print(
+            f"{'/'.join(result['problems'])} {result['query']}: "
+            f"{' / '.join(result['plan'])}"
+        )
+    print(
+        f"{len(results) - len(failed)}/{len(results)} のクエリで"
+        "全件走査・一時的なソートなし"
+    )
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run()) else 1)
@@ -0,0 +1,136 @@
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from models.auth import User
+from models.memo import Memo
+from config import Settings
+from hashing import hash_password
+import db
+
+
+# ============================================
+# ベンチマーク共通処理
+# ============================================
+# 一度にINSERTする件数
+SEED_BATCH_SIZE = 50_000
+
+
+# ベンチマーク用の一時SQLiteエンジン作成
+# アプリと同じ設定(PRAGMA, プール)を使用し、settings指定時はその設定を使用
+def create_temp_engine(settings: Settings | None = None) -> tuple[AsyncEngine, str]:
+    fd, path = tempfile.mkstemp(prefix="memodb_bench_", suffix=".sqlite")
+    os.close(fd)
+    return db.create_db_engine("sqlite+aiosqlite:///" + path, settings), path
+
+
+# 一時DBファイルの削除(WALの付随ファイルを含む)
+def remove_temp_db(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# テストデータ投入
+# ユーザー名は user{n}、パスワードハッシュはダミー値(password指定時は全員そのパスワード)
+# メモはユーザーに順番に割り当てる(memo_id が n のメモは user{(n - 1) % users + 1})
+async def seed(
+    engine: AsyncEngine, users: int, memos: int, password: str | None = None
+):
+    now = datetime.now()
+    salt = "x" * 44
+    hashed_password = (
+        await hash_password(password, salt.encode()) if password else "x" * 64
+    )
+    async with engine.begin() as conn:
+        for start in range(0, users, SEED_BATCH_SIZE):
+            await conn.execute(
+                insert(User.__table__),
+                [
+                    {
+                        "user_id": i + 1,
+                        "username": f"user{i + 1}",
+                        "password": hashed_password,
+                        "salt": salt,
+                        # メモのリビジョン(memo_id と同じ値)の最大値以上
+                        "memo_revision": memos,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for i in range(start, min(start + SEED_BATCH_SIZE, users))
+                ],
+            )
+        for start in range(0, memos, SEED_BATCH_SIZE):
+            await conn.execute(
+                insert(Memo.__table__),
+                [
+                    {
+                        "title": f"memo{i}",
+                        "description": "benchmark",
+                        "is_check": i % 2 == 0,
+                        "user_id": i % users + 1,
+                        "created_at": now,
+                        "revision": i + 1,
+                    }
+                    for i in range(start, min(start + SEED_BATCH_SIZE, memos))
+                ],
+            )
+
+
+# 指定エンジンのDBを使用するアプリのクライアント作成(プロセス内で実行)
+def create_client(engine: AsyncEngine) -> httpx.AsyncClient:
+    from main import app
+
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def get_dbsession():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[db.get_dbsession] = get_dbsession
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+    )
+
+
+# ログインしてAuthorizationヘッダーを取得
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post(
+        "/auth/login", data={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+# 処理時間の計測(ミリ秒)
+# func: 引数なしのコルーチン関数
+async def measure(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+# 計測結果の集計(ミリ秒)
+def summarize(samples: list[float]) -> dict:
+    samples = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 3)
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
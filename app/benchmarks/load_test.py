@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import (
+    create_client,
+    create_temp_engine,
+    login,
+    remove_temp_db,
+    seed,
+    summarize,
+)
+from init_database import migrate_db
+
+# ============================================
+# APIの負荷試験
+# 実行例(appディレクトリで実行)：
+#   python -m benchmarks.load_test --output result.json
+#   python -m benchmarks.load_test --mode uvicorn --workers 2 --concurrency 64
+#   python -m benchmarks.load_test --baseline baseline.json  # 基準より悪化した場合は終了コード1
+# シナリオごとに concurrency 個のクライアントが duration 秒間リクエストを送り続け、
+# RPS と処理時間(p50/p95/p99)をJSONで出力する
+# asgi: プロセス内でアプリを直接呼び出す(クライアントとアプリが同じCPUを使用)
+# uvicorn: 別プロセスで起動したuvicorn(serve.py)にHTTPで接続する
+# ============================================
+# シードしたユーザーのパスワード
+PASSWORD = "benchmark"
+
+# 混在シナリオ(mixed)の操作の割合
+MIXED_WEIGHTS = {
+    "list": 50,
+    "detail": 20,
+    "create": 10,
+    "update": 15,
+    "delete": 5,
+}
+
+SCENARIOS = ("signup", "login", "list", "detail", "create", "update", "delete", "mixed")
+
+# 基準と比較する項目(項目, 大きい方が良いか)
+COMPARE_METRICS = (("rps", True), ("p95_ms", False))
+
+
+# ログイン済みのユーザー(Authorizationヘッダーと削除可能なメモID)
+class BenchUser:
+    def __init__(self, user_id: int, headers: dict, memo_ids: list[int]):
+        self.user_id = user_id
+        self.headers = headers
+        self.memo_ids = memo_ids
+
+
+# ============================================
+# 操作(1リクエスト)
+# ============================================
+# いずれも (client, user, rng, counter) を受け取り、レスポンスを返す
+async def op_signup(client, user, rng, counter):
+    return await client.post(
+        "/auth/signup",
+        json={"username": f"signup{next(counter)}", "password": PASSWORD},
+    )
+
+
+async def op_login(client, user, rng, counter):
+    return await client.post(
+        "/auth/login", data={"username": f"user{user.user_id}", "password": PASSWORD}
+    )
+
+
+async def op_list(client, user, rng, counter):
+    return await client.get("/memos/", headers=user.headers)
+
+
+async def op_detail(client, user, rng, counter):
+    return await client.get(f"/memos/{rng.choice(user.memo_ids)}", headers=user.headers)
+
+
+async def op_create(client, user, rng, counter):
+    return await client.post(
+        "/memos/",
+        json={"title": f"load{next(counter)}", "description": "load test"},
+        headers=user.headers,
+    )
+
+
+async def op_update(client, user, rng, counter):
+    return await client.put(
+        f"/memos/{rng.choice(user.memo_ids)}",
+        json={"title": f"updated{next(counter)}", "is_check": rng.random() < 0.5},
+        headers=user.headers,
+    )
+
+
+async def op_delete(client, user, rng, counter):
+    # 削除済みのメモは対象から外す(残りが1件の場合は詳細・更新用に残す)
+    if len(user.memo_ids) <= 1:
+        return await op_create(client, user, rng, counter)
+    memo_id = user.memo_ids.pop(rng.randrange(len(user.memo_ids)))
+    return await client.delete(f"/memos/{memo_id}", headers=user.headers)
+
+
+OPERATIONS = {
+    "signup": op_signup,
+    "login": op_login,
+    "list": op_list,
+    "detail": op_detail,
+    "create": op_create,
+    "update": op_update,
+    "delete": op_delete,
+}
+
+
+# ============================================
+# 実行
+# ============================================
+async def run_scenario(
+    client: httpx.AsyncClient,
+    users: list[BenchUser],
+    scenario: str,
+    args,
+    counter,
+) -> dict:
+    samples: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+    names = list(MIXED_WEIGHTS) if scenario == "mixed" else [scenario]
+    weights = list(MIXED_WEIGHTS.values()) if scenario == "mixed" else None
+
+    async def worker(index: int):
+        nonlocal errors
+        rng = random.Random(args.seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            user = users[rng.randrange(len(users))]
+            operation = OPERATIONS[rng.choices(names, weights)[0]]
+            start = time.perf_counter()
+            try:
+                response = await operation(client, user, rng, counter)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    result = summarize(samples) if samples else {"count": 0}
+    result["rps"] = round(len(samples) / elapsed, 1)
+    result["errors"] = errors
+    return result
+
+
+# 負荷試験用のユーザーのログイン
+async def login_users(client: httpx.AsyncClient, args) -> list[BenchUser]:
+    users = []
+    for user_id in range(1, min(args.users, args.login_users) + 1):
+        headers = await login(client, f"user{user_id}", PASSWORD)
+        # シードしたメモのうち、このユーザーのもの
+        memo_ids = list(range(user_id, args.memos + 1, args.users))
+        users.append(BenchUser(user_id, headers, memo_ids))
+    return users
+
+
+async def run_all(client: httpx.AsyncClient, args) -> dict:
+    users = await login_users(client, args)
+    counter = itertools.count()
+    results = {}
+    for scenario in args.scenarios:
+        results[scenario] = await run_scenario(client, users, scenario, args, counter)
+        print(f">>> {scenario}: {results[scenario]}", file=sys.stderr)
+    return results
+
+
+# 空いているポート番号の取得
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# serve.py(uvicorn)の起動(起動処理が完了するまで待機)
+async def start_server(
+    db_path: str, workers: int, shared_state: str = "auto"
+) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = os.environ | {
+        "DATABASE_URL": "sqlite+aiosqlite:///" + db_path,
+        "LOG_LEVEL": "WARNING",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "serve.py",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--shared-state",
+            shared_state,
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError("uvicornの起動に失敗しました。")
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return process, base_url
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicornが応答しません。")
+
+
+# HTTPで負荷試験を実行
+async def run_http(base_url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        return await run_all(client, args)
+
+
+async def run(args) -> dict:
+    engine, path = create_temp_engine()
+    try:
+        await migrate_db(engine)
+        await seed(engine, args.users, args.memos, password=PASSWORD)
+        if args.mode == "asgi":
+            async with create_client(engine) as client:
+                results = await run_all(client, args)
+        else:
+            await engine.dispose()
+            process, base_url = await start_server(path, args.workers)
+            try:
+                results = await run_http(base_url, args)
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        await engine.dispose()
+        remove_temp_db(path)
+
+    return {
+        "config": {
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else None,
+            "users": args.users,
+            "memos": args.memos,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+
+
+# ============================================
+# 基準との比較
+# ============================================
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    基準の結果と比較する関数
+    Args:
+        report(dict): 今回の結果
+        baseline(dict): 基準の結果(同じ形式のJSON)
+        tolerance(float): 許容する悪化の割合(0.1 の場合、RPSが10%を超えて低下で悪化)
+    Returns:
+        list[dict]: シナリオ・項目ごとの比較結果(regression: 悪化したか)
+    """
+    comparison = []
+    for scenario, result in report["results"].items():
+        base = baseline.get("results", {}).get(scenario)
+        if not base:
+            continue
+        for metric, higher_is_better in COMPARE_METRICS:
+            if not base.get(metric) or metric not in result:
+                continue
+            ratio = result[metric] / base[metric]
+            regression = (
+                ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            )
+            comparison.append(
+                {
+                    "scenario": scenario,
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                    "ratio": round(ratio, 3),
+                    "regression": regression,
+                }
+            )
+    return comparison
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicornのワーカー数")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--memos", type=int, default=100_000)
+    parser.add_argument(
+        "--login-users", type=int, default=100, help="リクエストを送るユーザー数"
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5, help="シナリオごとの秒数")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果のJSONの出力先")
+    parser.add_argument("--baseline", help="比較する基準の結果のJSON")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="許容する悪化の割合"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print(">>> 警告：基準と実行条件(config)が異なります", file=sys.stderr)
+        report["comparison"] = compare(report, baseline, args.tolerance)
+        if any(item["regression"] for item in report["comparison"]):
+            exit_code = 1
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
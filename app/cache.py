@@ -0,0 +1,341 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+# ============================================
+# インメモリキャッシュ
+# ============================================
+# LRU + 有効期限付きのキャッシュ
+# get/set は await を含まないため、同一イベントループ上のタスク間では排他不要
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        """
+        Args:
+            maxsize(int): 保持する最大件数(超えた場合は最も古く使用されたものから削除)
+            ttl(float | None): 既定の有効期間(秒)、Noneの場合は無期限
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # キー -> (有効期限(time.time()基準), 値)
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.time():
+            # 有効期限切れ
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float | None = None):
+        """
+        Args:
+            key(Hashable): キー
+            value(Any): 値
+            expires_at(float | None): 有効期限(UNIX時間)、既定の有効期間より後の場合は既定の方を使用
+        """
+        if self.maxsize <= 0:
+            return
+        if self.ttl is not None:
+            default_expires_at = time.time() + self.ttl
+            if expires_at is None or expires_at > default_expires_at:
+                expires_at = default_expires_at
+        self._data[key] = (
+            expires_at if expires_at is not None else float("inf"),
+            value,
+        )
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def values(self) -> list[Any]:
+        return [value for _, value in self._data.values()]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+# 有効期限付きの集合(失効したトークン等の管理用)
+# TTLCacheと異なり件数の上限で削除しない(期限前に削除すると失効が取り消されるため)
+# 有効期間が同じ要素は追加順に期限切れとなるため、先頭から順に削除する
+class ExpiringSet:
+    def __init__(self, ttl: float):
+        """
+        Args:
+            ttl(float): 既定の有効期間(秒)
+        """
+        self.ttl = ttl
+        # キー -> 有効期限(time.time()基準)
+        self._data: OrderedDict[Hashable, float] = OrderedDict()
+
+    def add(self, key: Hashable, expires_at: float | None = None):
+        """
+        Args:
+            key(Hashable): キー
+            expires_at(float | None): 有効期限(UNIX時間)、Noneの場合は既定の有効期間
+        """
+        now = time.time()
+        self._purge(now)
+        self._data[key] = expires_at if expires_at is not None else now + self.ttl
+        self._data.move_to_end(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._data.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # 先頭から期限切れの要素を削除
+    def _purge(self, now: float):
+        while self._data:
+            key, expires_at = next(iter(self._data.items()))
+            if expires_at > now:
+                return
+            del self._data[key]
+
+
+# ============================================
+# キャッシュのバックエンド
+# ============================================
+# 値はシリアライズ済みのbytesで保持する(プロセス間で共有できる形式)
+# カウンター(incr)は世代番号の管理に使用する
+class CacheBackend:
+    # キャッシュの内容が初期化されるたびに変わる識別子
+    # カウンターが0から振り直されても、以前の世代番号と区別するために使用する
+    async def get_epoch(self) -> str:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+# プロセス内のLRUキャッシュ(既定)
+# カウンターも値と同じ件数・有効期間で保持し、古いものから削除する
+# 削除されたカウンターは0ではなく、これまでに払い出した最大値から再開する
+# (以前の値に戻らないため、その値で保存された古いキャッシュを使用することはない)
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counters = TTLCache(maxsize=maxsize, ttl=ttl)
+        # 全カウンターで払い出した最大値
+        self._sequence = 0
+        self._epoch = uuid.uuid4().hex[:8]
+
+    async def get_epoch(self) -> str:
+        return self._epoch
+
+    async def get(self, key: str) -> bytes | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes):
+        self._cache.set(key, value)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    async def get_counter(self, key: str) -> int:
+        value = self._counters.get(key)
+        if value is None:
+            value = self._sequence
+            self._counters.set(key, value)
+        return value
+
+    async def incr(self, key: str) -> int:
+        self._sequence += 1
+        self._counters.set(key, self._sequence)
+        return self._sequence
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats["backend"] = "memory"
+        # 保持している値の合計バイト数
+        stats["memory_bytes"] = sum(len(value) for value in self._cache.values())
+        return stats
+
+
+# Redis互換サーバーのキャッシュ(複数ワーカーで共有する場合)
+# redisパッケージが必要(pip install redis)
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, url: str, ttl: float | None = None, namespace: str = "cache"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redisバックエンドを使用するには redis パッケージが必要です。"
+            ) from e
+        self._client = redis.from_url(url)
+        self._ttl = int(ttl) if ttl else None
+        self._namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._epoch: str | None = None
+
+    def _key(self, key: str) -> str:
+        return f"{self._namespace}:{key}"
+
+    async def get_epoch(self) -> str:
+        if self._epoch is None:
+            # 未登録の場合のみ登録(サーバーのデータが消えた場合は新しい値になる)
+            await self._client.set(self._key("epoch"), uuid.uuid4().hex[:8], nx=True)
+            self._epoch = (await self._client.get(self._key("epoch"))).decode()
+        return self._epoch
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self._client.get(self._key(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes):
+        await self._client.set(self._key(key), value, ex=self._ttl)
+
+    async def delete(self, key: str):
+        await self._client.delete(self._key(key))
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self._client.get(self._key(key)) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self._key(key))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+# ============================================
+# 有効期限付きの集合のバックエンド(失効したログインの管理用)
+# ============================================
+class ExpiringSetBackend:
+    def __init__(self, ttl: float):
+        # 既定の有効期間(秒)
+        self.ttl = ttl
+
+    async def add(self, key: str, expires_at: float | None = None):
+        """
+        Args:
+            key(str): キー
+            expires_at(float | None): 有効期限(UNIX時間)、Noneの場合は既定の有効期間
+        """
+        raise NotImplementedError
+
+    async def contains(self, key: str) -> bool:
+        raise NotImplementedError
+
+
+# プロセス内の集合(既定)
+class MemoryExpiringSetBackend(ExpiringSetBackend):
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._set = ExpiringSet(ttl=ttl)
+
+    async def add(self, key: str, expires_at: float | None = None):
+        self._set.add(key, expires_at=expires_at)
+
+    async def contains(self, key: str) -> bool:
+        return key in self._set
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+
+# Redis互換サーバーの集合(複数ワーカーで共有する場合)
+# 要素ごとにキーを作成し、有効期限(PX)で削除させる
+class RedisExpiringSetBackend(ExpiringSetBackend):
+    def __init__(self, url: str, ttl: float, namespace: str):
+        super().__init__(ttl)
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redisバックエンドを使用するには redis パッケージが必要です。"
+            ) from e
+        self._client = redis.from_url(url)
+        self._namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self._namespace}:{key}"
+
+    async def add(self, key: str, expires_at: float | None = None):
+        expires_at = expires_at if expires_at is not None else time.time() + self.ttl
+        milliseconds = int((expires_at - time.time()) * 1000)
+        if milliseconds > 0:
+            await self._client.set(self._key(key), b"1", px=milliseconds)
+
+    async def contains(self, key: str) -> bool:
+        return await self._client.get(self._key(key)) is not None
+
+
+# 設定に応じたバックエンドの作成
+def create_expiring_set_backend(
+    backend: str, ttl: float, namespace: str
+) -> ExpiringSetBackend:
+    if backend == "redis":
+        from config import get_settings
+
+        return RedisExpiringSetBackend(
+            get_settings().redis_url, ttl=ttl, namespace=namespace
+        )
+    return MemoryExpiringSetBackend(ttl=ttl)
+
+
+# 設定に応じたバックエンドの作成
+def create_cache_backend(
+    backend: str, maxsize: int, ttl: float | None, namespace: str
+) -> CacheBackend:
+    if backend == "redis":
+        from config import get_settings
+
+        return RedisCacheBackend(get_settings().redis_url, ttl=ttl, namespace=namespace)
+    # none の場合は保持件数0(常にミス)
+    return MemoryCacheBackend(maxsize=maxsize if backend == "memory" else 0, ttl=ttl)
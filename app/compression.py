@@ -0,0 +1,246 @@
+import zlib
+from functools import lru_cache
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from cache import TTLCache
+
+# brotli, zstandard がインストールされている場合は使用(pip install brotli zstandard)
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# ============================================
+# レスポンスの圧縮
+# ============================================
+# Accept-Encoding で指定された方式(br, zstd, gzip)でレスポンスを圧縮する
+# ストリーミングのレスポンスはチャンクごとに圧縮して送信し、全体をバッファリングしない
+# Server-Sent Events(text/event-stream)は即時に届けるため圧縮しない
+
+
+# 圧縮処理(レスポンスごとに作成)
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31: gzip形式
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    # 圧縮して、ここまでの入力を全て出力する(クライアントがすぐに展開できる)
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# 使用できる圧縮方式(優先する順)
+SUPPORTED_ENCODINGS = tuple(
+    name
+    for name, available in (
+        ("br", brotli is not None),
+        ("zstd", zstandard is not None),
+        ("gzip", True),
+    )
+    if available
+)
+
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """
+    Accept-Encoding から使用する圧縮方式を選択する関数
+    q値が最も大きい方式を選び、同じ場合はSUPPORTED_ENCODINGSの順で優先する
+    Args:
+        accept_encoding(str): Accept-Encodingヘッダーの値(例: "gzip, br;q=0.8")
+    Returns:
+        str | None: 圧縮方式、使用できる方式が無い場合はNone
+    """
+    weights: dict[str, float] = {}
+    wildcard = 0.0
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        name, params = name.strip(), params.strip()
+        q = 1.0
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if name == "*":
+            wildcard = q
+        elif name in SUPPORTED_ENCODINGS:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for name in SUPPORTED_ENCODINGS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+# ============================================
+# ASGIミドルウェア
+# ============================================
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        cache_size: int = 1000,
+        excluded_media_types: tuple[str, ...] = ("text/event-stream",),
+    ):
+        """
+        Args:
+            app: ASGIアプリ
+            minimum_size(int): 圧縮する最小バイト数(ストリーミングは常に圧縮)
+            gzip_level(int): gzipの圧縮レベル(1〜9)
+            brotli_quality(int): brotliの圧縮品質(0〜11)
+            zstd_level(int): zstdの圧縮レベル
+            cache_size(int): 圧縮結果のキャッシュ件数(ETag, 方式 -> 圧縮後の本文)
+            excluded_media_types(tuple[str, ...]): 圧縮しないContent-Type
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.excluded_media_types = excluded_media_types
+        self._levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+        # ETagが同じレスポンスは本文も同じため、圧縮結果を再利用する
+        # (ポーリングで同じ一覧を返す場合に、毎回圧縮し直さない)
+        self.cache = TTLCache(maxsize=cache_size)
+
+    def create_encoder(self, encoding: str):
+        level = self._levels[encoding]
+        if encoding == "br":
+            return _BrotliEncoder(level)
+        if encoding == "zstd":
+            return _ZstdEncoder(level)
+        return _GzipEncoder(level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        responder = _CompressionResponder(
+            self, negotiate_encoding(accept_encoding) if accept_encoding else None, send
+        )
+        await self.app(scope, receive, responder.send)
+
+
+# レスポンス1件分の圧縮
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str | None, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start: dict | None = None
+        # None: 未判定, False: 圧縮しない, True: ストリーミングで圧縮中
+        self._streaming: bool | None = None
+        self._encoder = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # 本文の最初のチャンクを見て判定するため、送信を保留
+            self._start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._streaming is None:
+            await self._send_first(message, body, more_body)
+        elif self._streaming:
+            message["body"] = (
+                self._encoder.compress(body)
+                if more_body
+                else self._encoder.finish(body)
+            )
+            await self._send(message)
+        else:
+            await self._send(message)
+
+    # 最初のチャンクで圧縮するか判定し、ヘッダーを送信
+    async def _send_first(self, message, body: bytes, more_body: bool):
+        start = self._start
+        headers = MutableHeaders(raw=start["headers"])
+        self._streaming = False
+        if not self._compressible(start, headers) or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            await self._send(start)
+            await self._send(message)
+            return
+
+        # Accept-Encoding によって本文が変わることをキャッシュに伝える
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is None:
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            # ストリーミング: チャンクごとに圧縮して送信
+            self._streaming = True
+            self._encoder = self.middleware.create_encoder(self.encoding)
+            del headers["Content-Length"]
+            message["body"] = self._encoder.compress(body)
+        else:
+            message["body"] = self._compress_body(body, headers.get("etag"))
+            headers["Content-Length"] = str(len(message["body"]))
+        await self._send(start)
+        await self._send(message)
+
+    def _compressible(self, start, headers: MutableHeaders) -> bool:
+        if start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip()
+        return media_type not in self.middleware.excluded_media_types
+
+    # 本文全体の圧縮(ETagがある場合はキャッシュを使用)
+    def _compress_body(self, body: bytes, etag: str | None) -> bytes:
+        cache = self.middleware.cache
+        key = (etag, self.encoding)
+        if etag is not None:
+            compressed = cache.get(key)
+            if compressed is not None:
+                return compressed
+        compressed = self.middleware.create_encoder(self.encoding).finish(body)
+        if etag is not None:
+            cache.set(key, compressed)
+        return compressed
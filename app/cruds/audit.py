@@ -0,0 +1,64 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from config import get_settings
+from jobs import job_queue
+from models.audit import AuditLog
+
+
+# =============================================
+# 監査ログ
+# =============================================
+# メモの登録・更新・削除をジョブキュー経由で記録する
+# リクエストではキューへの登録のみ行い、書き込みはワーカーが複数リクエスト分をまとめて
+# 1回のINSERT(executemany)で行う(リクエストのトランザクション・応答時間に影響しない)
+# 書き込み先はリクエストのセッションと同じエンジン(ベンチマーク等で別のDBを使用する場合も同じDB)
+
+
+# 監査ログの1件分を作成(操作日時は作成時点)
+def entry(
+    user_id: int,
+    action: str,
+    memo_id: int | None,
+    revision: int | None = None,
+    detail: dict[str, Any] | None = None,
+) -> dict:
+    return {
+        "user_id": user_id,
+        "action": action,
+        "memo_id": memo_id,
+        "revision": revision,
+        "detail": (
+            json.dumps(detail, ensure_ascii=False, default=str) if detail else None
+        ),
+        "created_at": datetime.now(),
+    }
+
+
+# 監査ログの書き込み(ジョブキューから、登録された(エンジン, リスト)をまとめて受け取る)
+async def _write_audit_logs(batches: list[tuple[AsyncEngine, list[dict]]]):
+    rows_by_engine: dict[AsyncEngine, list[dict]] = {}
+    for engine, rows in batches:
+        rows_by_engine.setdefault(engine, []).extend(rows)
+    for engine, rows in rows_by_engine.items():
+        async with engine.begin() as conn:
+            await conn.execute(insert(AuditLog), rows)
+
+
+job_queue.register("audit_log", _write_audit_logs, batch=True)
+
+
+async def record(db_session: AsyncSession, entries: list[dict]):
+    """
+    監査ログをジョブキューに登録する関数
+    Args:
+        db_session(AsyncSession): 書き込みを行ったセッション(同じエンジンに記録する)
+        entries(list[dict]): entry で作成した監査ログのリスト
+    """
+    if not entries or not get_settings().audit_log_enabled:
+        return
+    await job_queue.enqueue("audit_log", (db_session.bind, entries))
@@ -1,62 +1,116 @@
 import base64
 import hashlib
+import logging
 import os
+import secrets
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import jwt
 
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from schemas.auth import UserCreateSchema, DecodedTokenSchema
-from models.auth import User
+from models.auth import User, RefreshToken
 from config import get_settings
+from hashing import hash_password
+from cache import TTLCache, create_expiring_set_backend
 
 
+logger = logging.getLogger(__name__)
+
 ALGORITHM = "HS256"
-SECRET_KEY = get_settings().secret_key
+
+# 検証済みアクセストークンのキャッシュ(トークン -> デコード結果)
+token_cache = TTLCache(
+    maxsize=get_settings().token_cache_size,
+    ttl=get_settings().token_cache_ttl_seconds,
+)
+
+# ユーザー名 -> 認証情報(UserIdentity)のキャッシュ
+# ログインのたびにusersを検索しないようにする
+# 他のプロセスでの変更は有効期間が過ぎるまで反映されない
+user_cache = TTLCache(
+    maxsize=get_settings().user_cache_size,
+    ttl=get_settings().user_cache_ttl_seconds,
+)
+
+# 失効したログイン(family_id)の集合
+# リクエストごとのアクセストークンの検証でDBにアクセスしないよう、
+# メモリ上(または複数ワーカーで共有するRedis互換サーバー)で管理する
+# アクセストークンの有効期間が過ぎれば、そのログインのアクセストークンは全て期限切れになる
+revoked_sessions = create_expiring_set_backend(
+    get_settings().revoked_session_backend,
+    ttl=get_settings().access_token_expire_minutes * 60,
+    namespace="revoked_sessions",
+)
 
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+# 認証に必要なユーザー情報
+@dataclass(frozen=True, slots=True)
+class UserIdentity:
+    user_id: int
+    username: str
+    # ハッシュ化パスワード
+    password: str
+    salt: str
+    # 最終更新日時
+    updated_at: datetime | None
+
+
+# 認証情報のキャッシュを無効化(ユーザー情報の変更後に呼び出す)
+def invalidate_user(username: str):
+    user_cache.delete(username)
+
+
 # ユーザー登録
 async def create_user(
     db_session: AsyncSession, user_create: UserCreateSchema
 ) -> User | None:
-    print("=== ユーザー新規登録：開始 ===")
+    logger.debug("ユーザー新規登録：開始", extra={"username": user_create.username})
+    # 既存ユーザー名の重複チェック
+    if await get_user_identity(db_session=db_session, username=user_create.username):
+        logger.debug("ユーザー名重複", extra={"username": user_create.username})
+        return None
+
     # ソルトの生成
     salt = base64.b64encode(os.urandom(32))
     # パスワードハッシュ化
-    hashed_password = hashlib.pbkdf2_hmac(
-        "sha256", user_create.password.encode(), salt, 1000
-    ).hex()
-
-    # TODO: 既存ユーザー名の重複チェック
+    hashed_password = await hash_password(user_create.password, salt)
 
     # ユーザ情報生成
     new_user = User(
         username=user_create.username, password=hashed_password, salt=salt.decode()
     )
     db_session.add(new_user)
-    await db_session.commit()
+    try:
+        await db_session.commit()
+    except IntegrityError:
+        # 同時登録によりユニークインデックスに違反した場合
+        await db_session.rollback()
+        logger.debug("ユーザー名重複", extra={"username": user_create.username})
+        return None
     await db_session.refresh(new_user)  # DBの内容を変数に反映(DBの情報と同期)
-    print(">>> ユーザー追加完了")
+    invalidate_user(new_user.username)
+    logger.debug("ユーザー追加完了", extra={"user_id": new_user.user_id})
     return new_user
 
 
 # ユーザー認証
 async def authenticate_user(
     db_session: AsyncSession, username: str, password: str
-) -> User | None:
+) -> UserIdentity | None:
     # ユーザー名から選択
-    user = await get_user_byname(db_session=db_session, username=username)
+    user = await get_user_identity(db_session=db_session, username=username)
     if not user:
         return None
 
-    hashed_password = hashlib.pbkdf2_hmac(
-        "sha256", password.encode(), user.salt.encode(), 1000
-    ).hex()
+    hashed_password = await hash_password(password, user.salt.encode())
     # パスワード失敗
     if user.password != hashed_password:
         return None
@@ -64,33 +118,234 @@ async def authenticate_user(
     return user
 
 
-# ユーザー取得(ユーザー名)
-async def get_user_byname(db_session: AsyncSession, username: str) -> User | None:
-    result = await db_session.execute(select(User).where(User.username == username))
-    print("=== ユーザー取得：開始  ===")
-    user = result.scalars().first()
-    if not user:
+# 認証情報取得(ユーザー名)
+async def get_user_identity(
+    db_session: AsyncSession, username: str
+) -> UserIdentity | None:
+    """
+    ユーザー名から認証に必要なユーザー情報を取得する関数
+    キャッシュに存在する場合はDBにアクセスしない
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        username(str): ユーザー名
+    Returns:
+        UserIdentity | None: ユーザー情報、ユーザーが存在しない場合はNoneを返す
+    """
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+
+    logger.debug("ユーザー取得：開始", extra={"username": username})
+    # 必要な列のみ取得(ORMのオブジェクトを作成しない)
+    result = await db_session.execute(
+        select(
+            User.user_id, User.username, User.password, User.salt, User.updated_at
+        ).where(User.username == username)
+    )
+    row = result.first()
+    if not row:
+        # 存在しないユーザー名はキャッシュしない(任意の名前でキャッシュを埋められないように)
         return None
-    print(">>> ユーザー取得完了")
+    user = UserIdentity(*row)
+    user_cache.set(username, user)
+    logger.debug("ユーザー取得完了", extra={"user_id": user.user_id})
     return user
 
 
 # アクセストークン生成
-def create_access_token(username: str, user_id: int, expires_delta: timedelta):
+def create_access_token(
+    username: str,
+    user_id: int,
+    expires_delta: timedelta,
+    session_id: str | None = None,
+):
     expires = datetime.now() + expires_delta
     payload = {"sub": username, "id": user_id, "exp": expires}
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    if session_id is not None:
+        payload["sid"] = session_id
+    return jwt.encode(payload, get_settings().secret_key, algorithm=ALGORITHM)
+
+
+# =============================================
+# リフレッシュトークン
+# =============================================
+# トークンは推測できない乱数のため、保存するハッシュ値は高速なSHA-256で十分
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# リフレッシュトークン生成(DBに登録、コミットは呼び出し元で行う)
+async def _add_refresh_token(
+    db_session: AsyncSession, user_id: int, family_id: str
+) -> str:
+    token = secrets.token_urlsafe(32)
+    await db_session.execute(
+        insert(RefreshToken).values(
+            token_hash=_hash_refresh_token(token),
+            family_id=family_id,
+            user_id=user_id,
+            expires_at=datetime.now()
+            + timedelta(days=get_settings().refresh_token_expire_days),
+        )
+    )
+    return token
+
+
+# ログイン時のリフレッシュトークン生成
+async def create_refresh_token(
+    db_session: AsyncSession, user_id: int
+) -> tuple[str, str]:
+    """
+    新しいログインのリフレッシュトークンを生成する関数
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        user_id(int): ログインしたユーザーのID
+    Returns:
+        tuple[str, str]: リフレッシュトークン, ログイン単位のID(family_id)
+    """
+    family_id = secrets.token_hex(16)
+    token = await _add_refresh_token(db_session, user_id, family_id)
+    await db_session.commit()
+    return token, family_id
+
+
+# リフレッシュトークンの使用(ローテーション)
+async def rotate_refresh_token(
+    db_session: AsyncSession, token: str
+) -> tuple[str, DecodedTokenSchema] | None:
+    """
+    リフレッシュトークンを使用済みにし、同じログインの新しいトークンを生成する関数
+    使用済みのトークンが再度使用された場合は漏洩とみなし、そのログインを失効させる
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        token(str): リフレッシュトークン
+    Returns:
+        tuple[str, DecodedTokenSchema] | None: 新しいリフレッシュトークン, ユーザー情報
+            トークンが無効な場合はNoneを返す
+    """
+    now = datetime.now()
+    token_hash = _hash_refresh_token(token)
+    # 使用済みにする(同時に使用された場合も1つのみ成功する)
+    result = await db_session.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+    )
+    row = result.first()
+    if row is None:
+        reused_family_id = await db_session.scalar(
+            select(RefreshToken.family_id).where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.used_at.is_not(None),
+                RefreshToken.revoked_at.is_(None),
+            )
+        )
+        if reused_family_id is None:
+            await db_session.rollback()
+            return None
+        logger.warning(
+            "使用済みのリフレッシュトークンが再使用されました",
+            extra={"family_id": reused_family_id},
+        )
+        await _revoke_session(db_session, reused_family_id)
+        return None
+
+    user_id, family_id = row
+    username = await db_session.scalar(
+        select(User.username).where(User.user_id == user_id)
+    )
+    new_token = await _add_refresh_token(db_session, user_id, family_id)
+    await db_session.commit()
+    return new_token, DecodedTokenSchema(
+        username=username, user_id=user_id, session_id=family_id
+    )
+
+
+# ログアウト
+async def revoke_refresh_token(db_session: AsyncSession, token: str) -> bool:
+    """
+    リフレッシュトークンのログインを失効させる関数
+    そのログインのリフレッシュトークン・アクセストークンは全て使用できなくなる
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        token(str): リフレッシュトークン
+    Returns:
+        bool: 失効させた場合True、トークンが存在しない場合はFalseを返す
+    """
+    family_id = await db_session.scalar(
+        select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == _hash_refresh_token(token)
+        )
+    )
+    if family_id is None:
+        return False
+    await _revoke_session(db_session, family_id)
+    return True
+
+
+# ログインの失効(DBと失効リストの両方に反映)
+async def _revoke_session(db_session: AsyncSession, family_id: str):
+    await db_session.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.now())
+    )
+    await db_session.commit()
+    await revoked_sessions.add(family_id)
+
+
+# 失効リストの読み込み(起動時に呼び出す)
+# アクセストークンが期限切れになっていない、直近に失効したログインのみ読み込む
+async def load_revoked_sessions(db_session: AsyncSession):
+    ttl = revoked_sessions.ttl
+    result = await db_session.execute(
+        select(RefreshToken.family_id, RefreshToken.revoked_at)
+        .where(RefreshToken.revoked_at > datetime.now() - timedelta(seconds=ttl))
+        .order_by(RefreshToken.revoked_at)
+    )
+    for family_id, revoked_at in result.all():
+        await revoked_sessions.add(family_id, expires_at=revoked_at.timestamp() + ttl)
 
 
 # アクセストークン取得
-def get_jwt_token(token: str = Depends(oauth2_schema)) -> DecodedTokenSchema:
+# キャッシュ済みのトークンは署名・有効期限の検証を省略
+# 失効したログインのトークンはキャッシュ済みでもエラー
+async def get_jwt_token(token: str = Depends(oauth2_schema)) -> DecodedTokenSchema:
+    decoded = token_cache.get(token)
+    if decoded is not None:
+        await _check_session(decoded)
+        return decoded
+
     try:
         # デコード(有効期限切れで例外)
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user_id = payload.get("id")
-        if username is None or user_id is None:
-            raise HTTPException(status_code=401, detail="無効なトークンです。")
-        return DecodedTokenSchema(username=username, user_id=user_id)
-    except jwt.JWTError:
+        payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="トークンの検証に失敗しました。")
+    username = payload.get("sub")
+    user_id = payload.get("id")
+    if username is None or user_id is None:
+        raise HTTPException(status_code=401, detail="無効なトークンです。")
+    decoded = DecodedTokenSchema(
+        username=username, user_id=user_id, session_id=payload.get("sid")
+    )
+    await _check_session(decoded)
+    # トークンの有効期限を超えてキャッシュしない
+    token_cache.set(token, decoded, expires_at=payload.get("exp"))
+    return decoded
+
+
+# ログアウト済みのトークンの場合はエラー
+async def _check_session(decoded: DecodedTokenSchema):
+    if decoded.session_id is not None and await revoked_sessions.contains(
+        decoded.session_id
+    ):
+        raise HTTPException(status_code=401, detail="ログアウト済みのトークンです。")
@@ -1,7 +1,305 @@
-from sqlalchemy import select
+import csv
+import io
+import logging
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import (
+    exists,
+    select,
+    update,
+    insert,
+    bindparam,
+    and_,
+    func,
+    literal_column,
+    or_,
+    tuple_,
+)
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import UnaryExpression
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 import schemas.memo as memo_schema
 import models.memo as memo_model
+from models.auth import User
+import cruds.audit as audit_crud
+from cache import create_cache_backend
+from config import get_settings
+from events import create_event_broker
+from jobs import job_queue
+import responses
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# メモのJSON変換
+# =============================================
+# 読み込み系の処理はORMのモデルではなく、MemoSchemaの項目のみの行(タプル)を返す
+# (ORMのオブジェクト作成・スキーマの検証を省略し、そのままJSONに変換する)
+_MEMO_FIELDS = tuple(memo_schema.MemoSchema.model_fields)
+MEMO_COLUMNS = tuple(getattr(memo_model.Memo, name) for name in _MEMO_FIELDS)
+
+# メモの検証・シリアライズ用(memo_fast_serialization が False(既定)の場合に使用)
+_memo_adapter = TypeAdapter(memo_schema.MemoSchema)
+_memo_list_adapter = TypeAdapter(list[memo_schema.MemoSchema])
+_memo_changes_adapter = TypeAdapter(memo_schema.MemoChangesSchema)
+
+
+# 行をdictに変換(Row._asdict()より速い)
+def _rows_to_dicts(rows: list[Row]) -> list[dict]:
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# メモの行をJSON(MemoSchema)に変換
+def dump_memo_json(row: Row) -> bytes:
+    memo = dict(zip(row._fields, row))
+    if not get_settings().memo_fast_serialization:
+        return _memo_adapter.dump_json(_memo_adapter.validate_python(memo))
+    return responses.dumps(memo)
+
+
+# メモの行のリストをJSON(list[MemoSchema])に変換
+def dump_memo_list_json(rows: list[Row]) -> bytes:
+    memos = _rows_to_dicts(rows)
+    if not get_settings().memo_fast_serialization:
+        return _memo_list_adapter.dump_json(_memo_list_adapter.validate_python(memos))
+    return responses.dumps(memos)
+
+
+_CSV_BOOL = {True: "true", False: "false"}
+
+
+# メモの行のリストをCSVに変換(header=Trueの場合は先頭にBOMとヘッダー行を付ける)
+def dump_memos_csv(rows: list[Row], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    if header:
+        # Excelで開いた場合に文字化けしないようにBOMを付ける
+        buffer.write("\ufeff")
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(_MEMO_FIELDS)
+    # csv.writer は None を空欄、True/False を "True"/"False" にするため bool のみ変換
+    writer.writerows(
+        [_CSV_BOOL[value] if isinstance(value, bool) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+# メモの差分取得の結果(MEMO_COLUMNS + revision, deleted_at の行)をJSONに変換
+def dump_memo_changes_json(rows: list[Row], since: int, has_more: bool) -> bytes:
+    memos, deleted = [], []
+    for row in rows:
+        if row.deleted_at is None:
+            memos.append(dict(zip(_MEMO_FIELDS, row)))
+        else:
+            deleted.append(row.memo_id)
+    changes = {
+        "revision": rows[-1].revision if rows else since,
+        "has_more": has_more,
+        "memos": memos,
+        "deleted": deleted,
+    }
+    if not get_settings().memo_fast_serialization:
+        return _memo_changes_adapter.dump_json(
+            _memo_changes_adapter.validate_python(changes)
+        )
+    return responses.dumps(changes)
+
+
+# JSON変換の初回実行(起動時に呼び出し、最初のリクエストで初期化処理を行わない)
+# memo_fast_serialization の設定にかかわらず、両方の変換を実行しておく
+def warm_up_serializers():
+    memo = {
+        "title": "warmup",
+        "description": "",
+        "is_check": False,
+        "memo_id": 0,
+        "user_id": 0,
+    }
+    changes = {"revision": 0, "has_more": False, "memos": [memo], "deleted": [0]}
+    _memo_adapter.dump_json(_memo_adapter.validate_python(memo))
+    _memo_list_adapter.dump_json(_memo_list_adapter.validate_python([memo]))
+    _memo_changes_adapter.dump_json(_memo_changes_adapter.validate_python(changes))
+    responses.dumps(changes)
+
+
+# =============================================
+# メモ一覧のキャッシュ
+# =============================================
+# ユーザー単位のメモ一覧(シリアライズ済みJSON)のキャッシュ
+memo_list_cache = create_cache_backend(
+    get_settings().memo_cache_backend,
+    maxsize=get_settings().memo_cache_size,
+    ttl=get_settings().memo_cache_ttl_seconds,
+    namespace="memo_list",
+)
+
+
+# ユーザー単位のメモの世代番号取得(メモの登録・更新・削除のたびに変わる)
+async def get_memo_list_version(user_id: int) -> str:
+    epoch = await memo_list_cache.get_epoch()
+    version = await memo_list_cache.get_counter(f"version:{user_id}")
+    return f"{epoch}.{version}"
+
+
+# メモ一覧のキャッシュキー取得
+# 更新のたびに世代番号を進めるため、更新前に読み込んだ古い一覧が
+# 更新後にキャッシュへ書き込まれても、以降の取得で使用されることはない
+async def _memo_list_key(user_id: int) -> str:
+    return f"{user_id}:{await get_memo_list_version(user_id)}"
+
+
+# メモ一覧のキャッシュを無効化(メモの登録・更新・削除後に呼び出す)
+# 世代番号はその場で進める(直後の取得から更新後の一覧を返す)
+# 古い一覧は以降使用されないため、削除はジョブキューで行う
+async def invalidate_memo_list(user_id: int):
+    old_key = await _memo_list_key(user_id)
+    await memo_list_cache.incr(f"version:{user_id}")
+    await job_queue.enqueue("memo_cache_delete", old_key)
+
+
+job_queue.register("memo_cache_delete", memo_list_cache.delete)
+
+
+# =============================================
+# メモの変更通知
+# =============================================
+# 登録・更新・削除の完了後にユーザー単位で発行し、/memos/stream で配信する
+# insert: 登録したメモ(MemoSchema)
+# update: memo_idと変更した項目(check: チェック状況のみ変更した場合)
+# delete: memo_id
+memo_events = create_event_broker(
+    get_settings().memo_event_backend,
+    history_size=get_settings().memo_event_history_size,
+    history_users=get_settings().memo_event_history_users,
+    queue_size=get_settings().memo_event_queue_size,
+)
+
+
+# 変更通知の発行(ジョブキューから呼び出す)
+# 同じユーザーのジョブは同じワーカーが登録順に実行するため、通知の順序は変わらない
+async def _publish_memo_events(payload: tuple[int, list[tuple[str, dict]]]):
+    user_id, events = payload
+    for event_type, data in events:
+        await memo_events.publish(user_id, event_type, data)
+
+
+job_queue.register("memo_events", _publish_memo_events)
+
+# 変更通知の種類から監査ログの操作への変換(チェック状況のみの変更も更新として記録)
+_AUDIT_ACTIONS = {"check": "update"}
+
+
+# 書き込みのコミット後の処理
+async def _after_commit(
+    db_session: AsyncSession, user_id: int, changes: list[tuple[str, dict, int]]
+):
+    """
+    メモ一覧のキャッシュを無効化し、変更通知・監査ログをジョブキューに登録する関数
+    Args:
+        db_session(AsyncSession): 書き込みを行ったセッション
+        user_id(int): 書き込んだユーザーのID
+        changes(list[tuple[str, dict, int]]): (変更通知の種類, 内容, リビジョン)のリスト
+    """
+    if not changes:
+        return
+    await invalidate_memo_list(user_id)
+    await job_queue.enqueue(
+        "memo_events",
+        (user_id, [(event_type, data) for event_type, data, _ in changes]),
+        key=user_id,
+    )
+    await audit_crud.record(
+        db_session,
+        [
+            audit_crud.entry(
+                user_id,
+                _AUDIT_ACTIONS.get(event_type, event_type),
+                data["memo_id"],
+                revision,
+                {
+                    name: value
+                    for name, value in data.items()
+                    if name not in ("memo_id", "user_id")
+                },
+            )
+            for event_type, data, revision in changes
+        ],
+    )
+
+
+# =============================================
+# メモのリビジョン(差分取得用)
+# =============================================
+# 登録・更新・削除したメモには、ユーザー単位で増加するリビジョンを設定する
+# 削除したメモは削除日時を設定して残し(tombstone)、差分取得で削除を通知する
+# 読み込み系の処理は削除済みのメモを除外する(_ALIVE)
+_ALIVE = memo_model.Memo.deleted_at.is_(None)
+
+
+# ユーザーのリビジョンをcount個確保し、最初の番号を返す
+# usersの行を更新するため、同じユーザーの書き込みはコミットまで待たされ、
+# リビジョンの順にコミットされる(差分取得で取りこぼさない)
+# memo_idを指定した場合は、該当ユーザーの削除されていないメモが存在する場合のみ確保する
+# (所有者の確認を同じUPDATE文で行い、対象外のメモへの書き込みではusersの行をロックしない)
+# ユーザー(memo_id指定時はメモ)が存在しない場合はNoneを返す
+async def _reserve_revisions(
+    db_session: AsyncSession, user_id: int, count: int, memo_id: int | None = None
+) -> int | None:
+    stmt = update(User).where(User.user_id == user_id)
+    if memo_id is not None:
+        stmt = stmt.where(
+            exists().where(
+                memo_model.Memo.memo_id == memo_id,
+                memo_model.Memo.user_id == user_id,
+                _ALIVE,
+            )
+        )
+    last = await db_session.scalar(
+        # ユーザーの更新日時は変更しない
+        stmt.values(
+            memo_revision=User.memo_revision + count, updated_at=User.updated_at
+        ).returning(User.memo_revision)
+    )
+    if last is None:
+        return None
+    return last - count + 1
+
+
+# 登録用のリビジョンを確保する(ユーザーが存在しない場合はHTTP 404エラー)
+async def _reserve_insert_revisions(
+    db_session: AsyncSession, user_id: int, count: int
+) -> int:
+    first_revision = await _reserve_revisions(db_session, user_id, count)
+    if first_revision is None:
+        await db_session.rollback()
+        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+    return first_revision
+
+
+# 一括更新・削除で実際に更新されたメモのIDを返す(コミット前に実行)
+# 対象の取得後に別のリクエストで削除されたメモは更新されないため、
+# 割り当てたリビジョンが設定されているメモのみを更新されたものとする
+async def _applied_ids(
+    db_session: AsyncSession, user_id: int, revisions: dict[int, int]
+) -> set[int]:
+    if not revisions:
+        return set()
+    result = await db_session.execute(
+        select(memo_model.Memo.memo_id, memo_model.Memo.revision).where(
+            memo_model.Memo.user_id == user_id,
+            memo_model.Memo.memo_id.in_(revisions),
+        )
+    )
+    return {memo_id for memo_id, revision in result if revision == revisions[memo_id]}
 
 
 # =============================================
@@ -13,94 +311,785 @@ async def insert_memo(
     memo_data: memo_schema.InsertAndUpdateMemoSchema,
     user_id: int,
 ) -> memo_model.Memo:
-    print("=== 新規登録：開始 ===")
+    logger.debug("新規登録：開始", extra={"user_id": user_id})
     # user_idを含む形でMemoモデルを作成
     memo_data_dict = memo_data.model_dump()
     memo_data_dict["user_id"] = user_id
+    memo_data_dict["revision"] = await _reserve_insert_revisions(db_session, user_id, 1)
     # new_memo = memo_model.Memo(**memo_data_dict.model_dump())
     new_memo = memo_model.Memo(**memo_data_dict)
     # DBに登録
     db_session.add(new_memo)
     await db_session.commit()
     await db_session.refresh(new_memo)  # DBの内容を変数に反映(DBの情報と同期)
-    print(">>> データ追加完了")
+    await _after_commit(
+        db_session,
+        user_id,
+        [
+            (
+                "insert",
+                {
+                    name: getattr(new_memo, name)
+                    for name in memo_schema.MemoSchema.model_fields
+                },
+                new_memo.revision,
+            )
+        ],
+    )
+    logger.debug("データ追加完了", extra={"memo_id": new_memo.memo_id})
     return new_memo
 
 
-# ユーザー単位で全件取得
-async def get_memos_by_user_id(db: AsyncSession, user_id: int):
-    result = await db.execute(
-        select(memo_model.Memo).where(memo_model.Memo.user_id == user_id)
+# ストリーミング取得時に一度にDBから読み込む件数
+STREAM_CHUNK_SIZE = 500
+
+
+# 並べ替えに使用する列
+_SORT_COLUMNS = {
+    "memo_id": memo_model.Memo.memo_id,
+    "created_at": memo_model.Memo.created_at,
+    "updated_at": memo_model.Memo.updated_at,
+    "title": memo_model.Memo.title,
+}
+
+
+# SQLiteで列のインデックスを使用させない(単項+演算子、PostgreSQL等ではそのまま)
+def _without_index(dialect: str | None, column):
+    if dialect != "sqlite":
+        return column
+    return UnaryExpression(column, operator=operators.custom_op("+"), type_=column.type)
+
+
+# ユーザー単位のメモ取得クエリ(キーセットページネーション)
+# 並べ替えの項目が同じ値のメモはmemo_id順に並べる
+# 並べ替えの項目以外の期間による絞り込みにはインデックスを使用させず、
+# 並べ替え用のインデックスの順に読み込む(一時的なソートを行わず、LIMIT件で読み込みを終える)
+def _select_memos_by_user_id(
+    dialect: str | None,
+    user_id: int,
+    after: int | None = None,
+    list_query: memo_schema.MemoListQuerySchema | None = None,
+):
+    Memo = memo_model.Memo
+    list_query = list_query or memo_schema.MemoListQuerySchema()
+    sort_column = _SORT_COLUMNS[list_query.sort]
+    created_at, updated_at = (
+        column if column is sort_column else _without_index(dialect, column)
+        for column in (Memo.created_at, Memo.updated_at)
+    )
+    stmt = select(*MEMO_COLUMNS).where(Memo.user_id == user_id, _ALIVE)
+    if list_query.is_check is not None:
+        stmt = stmt.where(Memo.is_check == list_query.is_check)
+    if list_query.created_from is not None:
+        stmt = stmt.where(created_at >= list_query.created_from)
+    if list_query.created_to is not None:
+        stmt = stmt.where(created_at < list_query.created_to)
+    if list_query.updated_from is not None:
+        stmt = stmt.where(updated_at >= list_query.updated_from)
+    if list_query.updated_to is not None:
+        stmt = stmt.where(updated_at < list_query.updated_to)
+
+    descending = list_query.order == "desc"
+    if sort_column is Memo.memo_id:
+        keys = [Memo.memo_id]
+        if after is not None:
+            # カーソル(前ページ最後のmemo_id)より後ろのみ取得
+            stmt = stmt.where(
+                Memo.memo_id < after if descending else Memo.memo_id > after
+            )
+    else:
+        keys = [sort_column, Memo.memo_id]
+        if after is not None:
+            # カーソルのメモの値より後ろのみ取得
+            # (カーソルのメモが削除済みの場合も、削除前の値の位置から取得する)
+            cursor_value = (
+                select(sort_column)
+                .where(Memo.memo_id == after, Memo.user_id == user_id)
+                .scalar_subquery()
+            )
+            row, cursor = tuple_(sort_column, Memo.memo_id), tuple_(cursor_value, after)
+            stmt = stmt.where(row < cursor if descending else row > cursor)
+    return stmt.order_by(*(key.desc() if descending else key for key in keys))
+
+
+# カーソルのメモが存在するか確認(削除済みのメモを含む)
+async def _cursor_exists(db: AsyncSession, user_id: int, after: int) -> bool:
+    memo_id = await db.scalar(
+        select(memo_model.Memo.memo_id).where(
+            memo_model.Memo.memo_id == after, memo_model.Memo.user_id == user_id
+        )
     )
-    return result.scalars().all()
+    return memo_id is not None
+
+
+# ユーザー単位で取得
+async def get_memos_by_user_id(
+    db: AsyncSession,
+    user_id: int,
+    limit: int | None = None,
+    after: int | None = None,
+    list_query: memo_schema.MemoListQuerySchema | None = None,
+) -> list[Row] | None:
+    """
+    ユーザー単位でメモを絞り込み・並べ替えて取得する関数(既定はmemo_id順)
+    Args:
+        db(AsyncSession): 非同期DBセッション
+        user_id(int): 取得対象のユーザーID
+        limit(int | None): 取得する最大件数、Noneの場合は全件
+        after(int | None): カーソル(前ページ最後のmemo_id)、このメモより後ろのみ取得
+        list_query(MemoListQuerySchema | None): 絞り込み・並べ替え条件
+    Returns:
+        list[Row] | None: 取得されたメモの行(MEMO_COLUMNS)のリスト
+            memo_id以外で並べ替え時にカーソルのメモが存在しない場合はNoneを返す
+    """
+    dialect = db.get_bind().dialect.name
+    stmt = _select_memos_by_user_id(dialect, user_id, after, list_query)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    memos = list(result.all())
+    if (
+        not memos
+        and after is not None
+        and list_query is not None
+        and list_query.sort != "memo_id"
+        and not await _cursor_exists(db, user_id, after)
+    ):
+        return None
+    return memos
+
+
+# ユーザー単位で全件取得(シリアライズ済みJSON、キャッシュ使用)
+async def get_memo_list_json(
+    db: AsyncSession, user_id: int, version: str | None = None
+) -> bytes:
+    """
+    ユーザー単位でメモ全件をJSON(list[MemoSchema])で取得する関数
+    キャッシュに存在する場合はDBにアクセスしない
+    Args:
+        db(AsyncSession): 非同期DBセッション
+        user_id(int): 取得対象のユーザーID
+        version(str | None): 取得済みの世代番号(get_memo_list_version)
+    Returns:
+        bytes: メモのリストのJSON
+    """
+    if version is None:
+        version = await get_memo_list_version(user_id)
+    key = f"{user_id}:{version}"
+    content = await memo_list_cache.get(key)
+    if content is not None:
+        return content
+
+    content = dump_memo_list_json(await get_memos_by_user_id(db, user_id))
+    await memo_list_cache.set(key, content)
+    return content
+
+
+# ユーザー単位でストリーミング取得
+async def stream_memos_by_user_id(
+    db: AsyncSession,
+    user_id: int,
+    after: int | None = None,
+    list_query: memo_schema.MemoListQuerySchema | None = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> AsyncIterator[list[Row]]:
+    """
+    ユーザー単位でメモをサーバーサイドカーソルから少しずつ取得する関数
+    全件をメモリに載せないため、件数に関わらずメモリ使用量は一定になる
+    Args:
+        db(AsyncSession): 非同期DBセッション
+        user_id(int): 取得対象のユーザーID
+        after(int | None): カーソル(前ページ最後のmemo_id)、このメモより後ろのみ取得
+        list_query(MemoListQuerySchema | None): 絞り込み・並べ替え条件
+        chunk_size(int): 一度に取得する件数
+    Yields:
+        list[Row]: 最大chunk_size件のメモの行(MEMO_COLUMNS)のリスト
+    """
+    dialect = db.get_bind().dialect.name
+    stmt = _select_memos_by_user_id(
+        dialect, user_id, after, list_query
+    ).execution_options(yield_per=chunk_size)
+    result = await db.stream(stmt)
+    async for chunk in result.partitions(chunk_size):
+        yield list(chunk)
 
 
 # 1件取得
-async def get_memo_by_id(
-    db_session: AsyncSession, memo_id: int
-) -> memo_model.Memo | None:
+async def get_memo_by_id(db_session: AsyncSession, memo_id: int) -> Row | None:
     """
     データベースから特定のメモ１件取得する関数
     Args:
         db_session(AsyncSession): 非同期DBセッション
         memo_id(int): 取得するメモのID(プリマリーキー)
     Returns:
-        Memo | None: 取得されたメモのモデル、メモが存在しない場合はNoneを返す
+        Row | None: 取得されたメモの行(MEMO_COLUMNS)、メモが存在しない場合はNoneを返す
     """
-    print("=== 1件取得：開始  ===")
+    logger.debug("1件取得：開始", extra={"memo_id": memo_id})
     # 取得するメモをIDにより選択
     result = await db_session.execute(
-        select(memo_model.Memo).where(memo_model.Memo.memo_id == memo_id)
+        select(*MEMO_COLUMNS).where(memo_model.Memo.memo_id == memo_id, _ALIVE)
     )
-    memo = result.scalars().first()
-    print(">>> データ取得完了")
+    memo = result.first()
+    logger.debug("データ取得完了", extra={"memo_id": memo_id})
     return memo
 
 
+# 差分取得
+async def get_memo_changes(
+    db_session: AsyncSession, user_id: int, since: int, limit: int
+) -> list[Row]:
+    """
+    指定したリビジョンより後に登録・更新・削除されたメモをリビジョン順に取得する関数
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        user_id(int): 取得対象のユーザーID
+        since(int): 取得済みのリビジョン、0の場合は削除されていないメモ全件
+        limit(int): 取得する最大件数
+    Returns:
+        list[Row]: メモの行(MEMO_COLUMNS, revision, deleted_at)のリスト
+    """
+    Memo = memo_model.Memo
+    stmt = select(*MEMO_COLUMNS, Memo.revision, Memo.deleted_at).where(
+        Memo.user_id == user_id, Memo.revision > since
+    )
+    if since == 0:
+        # 初回は削除済みのメモを通知する必要がない
+        stmt = stmt.where(_ALIVE)
+    result = await db_session.execute(stmt.order_by(Memo.revision).limit(limit))
+    return list(result.all())
+
+
 # 更新処理
 async def update_memo(
     db_session: AsyncSession,
     memo_id: int,
     target_data: memo_schema.InsertAndUpdateMemoSchema,
+    user_id: int,
 ) -> memo_model.Memo | None:
     """
     データベースのメモを更新する関数
+    所有者の確認とリビジョンの確保を1つのUPDATE文で行った後、メモを更新する(RETURNING)
     Args:
         db_session(AsyncSession): 非同期DBセッション
         memo_id(int): 更新するメモのID(プライマリーキー)
         target_date(InsertAndUpdateMemoSchema): 更新するデータ
+        user_id(int): 更新するユーザーのID(メモの所有者)
     Returns:
-        Memo | None: 更新されたメモのモデル、メモが存在しない場合はNoneを返す
-    """
-    print("=== データ更新：開始 ===")
-    memo: memo_model.Memo = await get_memo_by_id(db_session, memo_id)  # 指定のメモ取得
-    if memo:
-        memo.title = target_data.title
-        memo.description = target_data.description
-        memo.is_check = target_data.is_check
-        db_session.add(memo)
-        await db_session.commit()
-        await db_session.refresh(memo)
-        print(">>> データ更新完了")
+        Memo | None: 更新されたメモのモデル、該当ユーザーのメモが存在しない場合はNoneを返す
+    """
+    logger.debug("データ更新：開始", extra={"memo_id": memo_id})
+    revision = await _reserve_revisions(db_session, user_id, 1, memo_id)
+    if revision is None:
+        # 該当ユーザーのメモが存在しない(usersの行は更新していない)
+        await db_session.rollback()
+        return None
+    result = await db_session.scalars(
+        update(memo_model.Memo)
+        .where(
+            memo_model.Memo.memo_id == memo_id,
+            memo_model.Memo.user_id == user_id,
+            _ALIVE,
+        )
+        .values(
+            title=target_data.title,
+            description=target_data.description,
+            is_check=target_data.is_check,
+            revision=revision,
+        )
+        .returning(memo_model.Memo)
+    )
+    memo = result.first()
+    if not memo:
+        # 確保したリビジョンも取り消す
+        await db_session.rollback()
+        return None
 
+    await db_session.commit()
+    await _after_commit(
+        db_session,
+        user_id,
+        [("update", {"memo_id": memo_id, **target_data.model_dump()}, revision)],
+    )
+    logger.debug("データ更新完了", extra={"memo_id": memo_id})
     return memo
 
 
 # 削除処理
-async def delete_memo(db_session: AsyncSession, memo_id: int) -> memo_model.Memo | None:
+async def delete_memo(db_session: AsyncSession, memo_id: int, user_id: int) -> bool:
     """
     データベースのメモ削除する関数
+    所有者の確認とリビジョンの確保を1つのUPDATE文で行った後、メモを削除する
+    (削除日時を設定し、差分取得用に残す)
     Args:
         db_session(AsyncSession): 非同期セッション
         memo_id(memo_id): 削除するメモのID(プライマリーキー)
+        user_id(int): 削除するユーザーのID(メモの所有者)
     Returns:
-        Memo | None: 削除されたメモのモデル、メモが存在しない場合はNoneを返す
+        bool: 削除された場合True、該当ユーザーのメモが存在しない場合はFalseを返す
     """
-    print("=== データ削除：開始 ===")
-    memo = await get_memo_by_id(db_session, memo_id)
-    if memo:
-        await db_session.delete(memo)
-        await db_session.commit()
-        print(">>> データ削除完了")
+    logger.debug("データ削除：開始", extra={"memo_id": memo_id})
+    revision = await _reserve_revisions(db_session, user_id, 1, memo_id)
+    if revision is None:
+        # 該当ユーザーのメモが存在しない(usersの行は更新していない)
+        await db_session.rollback()
+        return False
+    result = await db_session.execute(
+        update(memo_model.Memo)
+        .where(
+            memo_model.Memo.memo_id == memo_id,
+            memo_model.Memo.user_id == user_id,
+            _ALIVE,
+        )
+        .values(deleted_at=datetime.now(), revision=revision)
+    )
+    if result.rowcount == 0:
+        # 確保したリビジョンも取り消す
+        await db_session.rollback()
+        return False
 
-    return memo
+    await db_session.commit()
+    await _after_commit(
+        db_session, user_id, [("delete", {"memo_id": memo_id}, revision)]
+    )
+    logger.debug("データ削除完了", extra={"memo_id": memo_id})
+    return True
+
+
+# =============================================
+# 一括処理(いずれも1トランザクションで実行)
+# =============================================
+# 一括新規登録
+async def insert_memos(
+    db_session: AsyncSession,
+    memos_data: list[memo_schema.InsertAndUpdateMemoSchema],
+    user_id: int,
+) -> list[int]:
+    """
+    複数のメモを1つのINSERT文(executemany)で登録する関数
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        memos_data(list[InsertAndUpdateMemoSchema]): 登録するデータのリスト
+        user_id(int): 登録するユーザーのID
+    Returns:
+        list[int]: 採番されたメモのIDのリスト(memos_dataと同じ順序)
+    """
+    logger.debug("一括登録：開始", extra={"user_id": user_id})
+    first_revision = await _reserve_insert_revisions(
+        db_session, user_id, len(memos_data)
+    )
+    result = await db_session.scalars(
+        insert(memo_model.Memo).returning(
+            memo_model.Memo.memo_id, sort_by_parameter_order=True
+        ),
+        [
+            {**memo_data.model_dump(), "user_id": user_id, "revision": revision}
+            for revision, memo_data in enumerate(memos_data, first_revision)
+        ],
+    )
+    memo_ids = list(result.all())
+    await db_session.commit()
+    await _after_commit(
+        db_session,
+        user_id,
+        [
+            (
+                "insert",
+                {**memo_data.model_dump(), "memo_id": memo_id, "user_id": user_id},
+                revision,
+            )
+            for revision, (memo_id, memo_data) in enumerate(
+                zip(memo_ids, memos_data), first_revision
+            )
+        ],
+    )
+    logger.debug("一括登録完了", extra={"count": len(memo_ids)})
+    return memo_ids
+
+
+# 一括更新
+async def update_memos(
+    db_session: AsyncSession,
+    targets: list[memo_schema.BatchUpdateItemSchema],
+    user_id: int,
+) -> set[int]:
+    """
+    複数のメモを更新する関数
+    所有者のメモIDを1回で取得した後、更新する項目の組み合わせごとにexecutemanyで更新する
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        targets(list[BatchUpdateItemSchema]): 更新するデータのリスト
+        user_id(int): 更新するユーザーのID(メモの所有者)
+    Returns:
+        set[int]: 更新されたメモのIDの集合(対象外・削除済みのメモは含まない)
+    """
+    logger.debug("一括更新：開始", extra={"user_id": user_id})
+    owned_ids = set(
+        (
+            await db_session.scalars(
+                select(memo_model.Memo.memo_id).where(
+                    memo_model.Memo.user_id == user_id,
+                    memo_model.Memo.memo_id.in_({t.memo_id for t in targets}),
+                    _ALIVE,
+                )
+            )
+        ).all()
+    )
+
+    # 更新するメモごとにリビジョンを割り当てる(同じメモを複数回指定した場合も1つ)
+    first_revision = None
+    if owned_ids:
+        first_revision = await _reserve_revisions(db_session, user_id, len(owned_ids))
+    if first_revision is None:
+        # 対象のメモ・ユーザーが存在しない(usersの行は更新していない)
+        await db_session.rollback()
+        return set()
+    revisions = {
+        memo_id: revision
+        for revision, memo_id in enumerate(sorted(owned_ids), first_revision)
+    }
+
+    # 同じメモを複数回指定した場合は1つにまとめる(項目ごとにリクエストの後の値を使用)
+    # (項目の組み合わせごとに更新するため、まとめないとリクエストの順に更新されない)
+    changes: dict[int, dict] = {}
+    for target in targets:
+        if target.memo_id in owned_ids:
+            changes.setdefault(target.memo_id, {}).update(
+                target.model_dump(exclude={"memo_id"}, exclude_none=True)
+            )
+
+    # 更新する項目の組み合わせごとにまとめる
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for memo_id, values in changes.items():
+        groups.setdefault(tuple(sorted(values)), []).append(
+            {
+                "b_memo_id": memo_id,
+                "b_user_id": user_id,
+                "b_revision": revisions[memo_id],
+                **{"b_" + field: value for field, value in values.items()},
+            }
+        )
+
+    table = memo_model.Memo.__table__
+    for fields, params in groups.items():
+        await db_session.execute(
+            update(table)
+            .where(
+                table.c.memo_id == bindparam("b_memo_id"),
+                table.c.user_id == bindparam("b_user_id"),
+                table.c.deleted_at.is_(None),
+            )
+            .values(
+                {field: bindparam("b_" + field) for field in fields},
+            )
+            .values(revision=bindparam("b_revision")),
+            params,
+        )
+    updated_ids = await _applied_ids(db_session, user_id, revisions)
+    await db_session.commit()
+    await _after_commit(
+        db_session,
+        user_id,
+        [
+            (
+                "check" if values.keys() == {"is_check"} else "update",
+                {"memo_id": memo_id, **values},
+                revisions[memo_id],
+            )
+            for memo_id, values in changes.items()
+            if memo_id in updated_ids
+        ],
+    )
+    logger.debug("一括更新完了", extra={"count": len(updated_ids)})
+    return updated_ids
+
+
+# 一括削除
+async def delete_memos(
+    db_session: AsyncSession, memo_ids: list[int], user_id: int
+) -> set[int]:
+    """
+    複数のメモを削除する関数
+    所有者の削除されていないメモIDを1回で取得した後、executemanyで削除日時を設定する
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        memo_ids(list[int]): 削除するメモのIDのリスト
+        user_id(int): 削除するユーザーのID(メモの所有者)
+    Returns:
+        set[int]: 削除されたメモのIDの集合
+    """
+    logger.debug("一括削除：開始", extra={"user_id": user_id})
+    result = await db_session.scalars(
+        select(memo_model.Memo.memo_id).where(
+            memo_model.Memo.user_id == user_id,
+            memo_model.Memo.memo_id.in_(set(memo_ids)),
+            _ALIVE,
+        )
+    )
+    deleted_ids = set(result.all())
+    first_revision = None
+    if deleted_ids:
+        first_revision = await _reserve_revisions(db_session, user_id, len(deleted_ids))
+    if first_revision is None:
+        # 対象のメモ・ユーザーが存在しない(usersの行は更新していない)
+        await db_session.rollback()
+        return set()
+    revisions = {
+        memo_id: revision
+        for revision, memo_id in enumerate(sorted(deleted_ids), first_revision)
+    }
+    table = memo_model.Memo.__table__
+    deleted_at = datetime.now()
+    await db_session.execute(
+        update(table)
+        .where(
+            table.c.memo_id == bindparam("b_memo_id"),
+            table.c.user_id == bindparam("b_user_id"),
+            table.c.deleted_at.is_(None),
+        )
+        .values(deleted_at=deleted_at, revision=bindparam("b_revision")),
+        [
+            {"b_memo_id": memo_id, "b_user_id": user_id, "b_revision": revision}
+            for memo_id, revision in revisions.items()
+        ],
+    )
+    deleted_ids = await _applied_ids(db_session, user_id, revisions)
+    await db_session.commit()
+    await _after_commit(
+        db_session,
+        user_id,
+        [
+            ("delete", {"memo_id": memo_id}, revision)
+            for memo_id, revision in revisions.items()
+            if memo_id in deleted_ids
+        ],
+    )
+    logger.debug("一括削除完了", extra={"count": len(deleted_ids)})
+    return deleted_ids
+
+
+# =============================================
+# インポート(チャンクごとに1トランザクションで登録)
+# =============================================
+# 登録済みのチャンクは途中でエラー・切断があっても取り消さない
+# 変更通知はメモごとではなく、チャンクごとに import(進捗)を発行する
+# (クライアントは /memos/changes で登録されたメモを取得する)
+async def _import_chunk(
+    db_session: AsyncSession,
+    memos_data: list[memo_schema.InsertAndUpdateMemoSchema],
+    user_id: int,
+) -> int:
+    # 1つのINSERT文(executemany)で登録し、最後のリビジョンを返す
+    first_revision = await _reserve_insert_revisions(
+        db_session, user_id, len(memos_data)
+    )
+    await db_session.execute(
+        insert(memo_model.Memo),
+        [
+            {**memo_data.model_dump(), "user_id": user_id, "revision": revision}
+            for revision, memo_data in enumerate(memos_data, first_revision)
+        ],
+    )
+    await db_session.commit()
+    return first_revision + len(memos_data) - 1
+
+
+async def import_memos(
+    db_session: AsyncSession,
+    rows: AsyncIterator[tuple[int, memo_schema.InsertAndUpdateMemoSchema | str]],
+    user_id: int,
+    chunk_size: int,
+    max_errors: int,
+) -> memo_schema.MemoImportResultSchema:
+    """
+    解析済みの行を chunk_size 件ずつ登録する関数
+    登録したチャンクの分だけメモリを使用するため、行数に関わらずメモリ使用量は一定になる
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        rows(AsyncIterator[tuple[int, InsertAndUpdateMemoSchema | str]]):
+            (行番号, メモ or エラー内容)、memo_import.parse_ndjson 等の結果
+        user_id(int): 登録するユーザーのID
+        chunk_size(int): 1トランザクションで登録する件数
+        max_errors(int): 結果に含めるエラー行の上限
+    Returns:
+        MemoImportResultSchema: 処理件数・登録件数・エラー件数とエラー行
+    """
+    logger.debug("インポート：開始", extra={"user_id": user_id})
+    result = memo_schema.MemoImportResultSchema(
+        processed=0, inserted=0, failed=0, errors=[]
+    )
+    chunk: list[memo_schema.InsertAndUpdateMemoSchema] = []
+
+    async def flush():
+        revision = await _import_chunk(db_session, chunk, user_id)
+        result.inserted += len(chunk)
+        await invalidate_memo_list(user_id)
+        await job_queue.enqueue(
+            "memo_events",
+            (
+                user_id,
+                [
+                    (
+                        "import",
+                        {
+                            "processed": result.processed,
+                            "inserted": result.inserted,
+                            "failed": result.failed,
+                            "revision": revision,
+                        },
+                    )
+                ],
+            ),
+            key=user_id,
+        )
+        await audit_crud.record(
+            db_session,
+            [
+                audit_crud.entry(
+                    user_id, "import", None, revision, {"count": len(chunk)}
+                )
+            ],
+        )
+        chunk.clear()
+
+    async for line_number, row in rows:
+        result.processed += 1
+        if isinstance(row, str):
+            result.failed += 1
+            if len(result.errors) < max_errors:
+                result.errors.append(
+                    memo_schema.MemoImportErrorSchema(line=line_number, detail=row)
+                )
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+    logger.info(
+        "インポート完了",
+        extra={
+            "user_id": user_id,
+            "processed": result.processed,
+            "inserted": result.inserted,
+            "failed": result.failed,
+        },
+    )
+    return result
+
+
+# =============================================
+# 全文検索
+# =============================================
+# 全文検索(trigram)で検索できる語の最小文字数
+# これより短い語を含む場合はLIKEによる検索を行う
+SEARCH_MIN_TERM_LENGTH = 3
+
+# PostgreSQLの全文検索用の文書(インデックスの式と一致させる必要がある)
+_POSTGRES_SEARCH_DOCUMENT = literal_column(
+    "to_tsvector('simple', coalesce(memos.title, '') || ' ' "
+    "|| coalesce(memos.description, ''))"
+)
+
+
+# FTS5の関連度(rank)の計算式
+# bm25は値が小さいほど関連度が高い(user_key の重みは0)
+_FTS5_RANK = "bm25(0.0, 1.0, 1.0)"
+
+
+# 検索語をFTS5の検索式に変換(各語をフレーズとして扱い、AND検索)
+# 記号(", *, AND 等)を検索式の構文として解釈させないためにクォートする
+def _fts5_query(user_id: int, terms: list[str]) -> str:
+    phrases = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    user_key = memo_model.fts_user_key(user_id)
+    return f'user_key : "{user_key}" AND {{title description}} : ({phrases})'
+
+
+# LIKEによる検索(全ての語をタイトルか詳細に含むメモ、memo_id順)
+def _select_memos_like(user_id: int, terms: list[str]):
+    Memo = memo_model.Memo
+    return (
+        select(*MEMO_COLUMNS)
+        .where(
+            Memo.user_id == user_id,
+            _ALIVE,
+            and_(
+                *(
+                    or_(
+                        Memo.title.contains(term, autoescape=True),
+                        Memo.description.contains(term, autoescape=True),
+                    )
+                    for term in terms
+                )
+            ),
+        )
+        .order_by(Memo.memo_id)
+    )
+
+
+# DBの種類に応じた検索クエリ(関連度順)
+def _select_memos_search(dialect: str, user_id: int, terms: list[str]):
+    Memo = memo_model.Memo
+    if dialect == "sqlite" and all(
+        len(term) >= SEARCH_MIN_TERM_LENGTH for term in terms
+    ):
+        fts = memo_model.memos_fts
+        return (
+            select(*MEMO_COLUMNS)
+            .select_from(fts)
+            .join(Memo, Memo.memo_id == fts.c.rowid)
+            .where(
+                literal_column("memos_fts").op("MATCH")(_fts5_query(user_id, terms)),
+                literal_column("memos_fts.rank").op("MATCH")(
+                    bindparam("fts_rank", _FTS5_RANK)
+                ),
+                Memo.user_id == user_id,
+                _ALIVE,
+            )
+            # FTS5のrank順はFTS5内で並べ替えるため、一時的なソート(TEMP B-TREE)を行わない
+            # (関連度が同じメモは、FTS5が読み込んだrowid(memo_id)の順)
+            .order_by(literal_column("memos_fts.rank"))
+        )
+    if dialect == "postgresql":
+        query = func.plainto_tsquery("simple", " ".join(terms))
+        return (
+            select(*MEMO_COLUMNS)
+            .where(
+                _POSTGRES_SEARCH_DOCUMENT.op("@@")(query),
+                Memo.user_id == user_id,
+                _ALIVE,
+            )
+            .order_by(
+                func.ts_rank(_POSTGRES_SEARCH_DOCUMENT, query).desc(), Memo.memo_id
+            )
+        )
+    return _select_memos_like(user_id, terms)
+
+
+# 検索
+async def search_memos(
+    db_session: AsyncSession,
+    user_id: int,
+    q: str,
+    limit: int,
+    offset: int = 0,
+) -> list[Row]:
+    """
+    ユーザーのメモをタイトル・詳細から検索する関数
+    SQLiteはFTS5、PostgreSQLはtsvectorのインデックスを使用し、関連度順に返す
+    (SQLiteで3文字未満の語を含む場合はLIKEで検索し、memo_id順に返す)
+    Args:
+        db_session(AsyncSession): 非同期DBセッション
+        user_id(int): 検索対象のユーザーID
+        q(str): 検索語(空白区切りで複数指定した場合はAND検索)
+        limit(int): 取得する最大件数
+        offset(int): 読み飛ばす件数
+    Returns:
+        list[Row]: 検索されたメモの行(MEMO_COLUMNS)のリスト
+    """
+    terms = q.split()
+    if not terms:
+        return []
+    dialect = db_session.get_bind().dialect.name
+    stmt = _select_memos_search(dialect, user_id, terms).limit(limit).offset(offset)
+    result = await db_session.execute(stmt)
+    return list(result.all())
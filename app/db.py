@@ -1,7 +1,14 @@
 import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from config import Settings, get_settings
+import metrics
+
 # ============================================
 # DBアクセス
 # ============================================
@@ -10,15 +17,119 @@ Base = declarative_base()
 
 # DBファイル作成
 base_dir = os.path.dirname(__file__)
-# データベースのURL
-DATABASE_URL = "sqlite+aiosqlite:///" + os.path.join(base_dir, "memodb.sqlite")
+# データベースのURL(設定で未指定の場合)
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///" + os.path.join(base_dir, "memodb.sqlite")
+
+
+# SQLiteの接続ごとの設定(PRAGMA)
+def _set_sqlite_pragmas(dbapi_connection, settings: Settings):
+    cursor = dbapi_connection.cursor()
+    # WAL: 読み込みと書き込みが互いにブロックしない
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    # WALではNORMALでも破損しない(電源断時に直近のコミットが失われる可能性のみ)
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    # ロック中の場合、エラーにせず指定ミリ秒まで待機
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    # 読み込みをメモリマップで行う
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+# コネクションの取得待ち時間を計測するコネクションプール
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # プールのログを元のクラスと同じロガー(sqlalchemy.pool.*)に出力する
+    # (既定では db.TimedQueuePool になり、log.setup_logging のレベル設定が適用されない)
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_pool_checkout_wait(time.perf_counter() - start)
+
 
 # 非同期エンジンの作成
-engine = create_async_engine(DATABASE_URL, echo=True)
+def create_db_engine(
+    url: str | None = None, settings: Settings | None = None
+) -> AsyncEngine:
+    """
+    設定に応じた非同期エンジンを作成する関数
+    Args:
+        url(str | None): データベースのURL、Noneの場合は設定値
+        settings(Settings | None): 設定、Noneの場合はget_settings()
+    Returns:
+        AsyncEngine: 非同期エンジン
+    """
+    settings = settings or get_settings()
+    url = url or settings.database_url or DEFAULT_DATABASE_URL
+    options = {"echo": settings.db_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    is_sqlite = make_url(url).get_backend_name() == "sqlite"
+    if not (is_sqlite and make_url(url).database in (None, "", ":memory:")):
+        # インメモリのSQLite以外はコネクションプールの設定を使用
+        # (aiosqliteは既定でプール無しのため明示的に指定)
+        # TimedQueuePool で取得待ち時間を計測する
+        options |= {
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+    engine = create_async_engine(url, **options)
+    # SQLの発行数・実行時間の計測
+    event.listen(
+        engine.sync_engine, "before_cursor_execute", metrics.before_cursor_execute
+    )
+    event.listen(
+        engine.sync_engine, "after_cursor_execute", metrics.after_cursor_execute
+    )
+
+    if is_sqlite:
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            _set_sqlite_pragmas(dbapi_connection, settings)
 
-# 非同期セッションの設定
+    return engine
+
+
+# アプリで使用するエンジン・セッション(初回使用時に作成)
+# インポート時に作成しないことで、起動時のインポートを軽くする
+# (ドライバの読み込み等はアプリの起動処理(lifespan)で行う)
+_engine: AsyncEngine | None = None
+_session_factory: sessionmaker | None = None
+
+
+# アプリで使用する非同期エンジンの取得
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine()
+    return _engine
+
+
+# 非同期セッションの作成
 # expire_on_commit=False でコミット後もDBから取得したオブジェクトが使用可能
-async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# bind指定時はそのエンジンを使用(リクエストのセッションと同じDBで別のセッションを作成する場合)
+def async_session(bind: AsyncEngine | None = None) -> AsyncSession:
+    if bind is not None:
+        return AsyncSession(bind, expire_on_commit=False)
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            get_engine(), expire_on_commit=False, class_=AsyncSession
+        )
+    return _session_factory()
+
+
+# コネクションプールを閉じる(エンジンを作成していない場合は何もしない)
+async def dispose_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
 
 
 # DBとのセッションを非同期的に扱うことができる関数
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from cache import TTLCache
+
+
+# ============================================
+# メモの変更通知(Pub/Sub)
+# ============================================
+# 書き込み処理(cruds/memo.py)がユーザー単位でイベントを発行し、
+# /memos/stream の購読者に配信する
+# イベントIDを指定して購読すると、そのイベントより後のイベントから再開できる
+
+
+# イベント
+@dataclass
+class MemoEvent:
+    # イベントID(SSEのid、再開時に指定する値)
+    id: str
+    # insert, update, check, delete, reset(再取得が必要)
+    type: str
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+class EventBroker:
+    async def publish(self, user_id: int, event_type: str, data: dict[str, Any]):
+        raise NotImplementedError
+
+    def subscribe(
+        self, user_id: int, last_event_id: str | None, timeout: float
+    ) -> AsyncIterator[MemoEvent | None]:
+        """
+        ユーザーのイベントを購読する
+        Args:
+            user_id(int): 購読するユーザーID
+            last_event_id(str | None): 受信済みの最後のイベントID、Noneの場合は以降のイベントのみ
+                このイベント以降の履歴が残っていない場合は reset イベントを返す
+            timeout(float): イベントが無い場合にNoneを返すまでの秒数(接続維持用)
+        Yields:
+            MemoEvent | None: イベント、timeout秒イベントが無い場合はNone
+        """
+        raise NotImplementedError
+
+
+# ユーザー単位の直近のイベント
+class _EventHistory:
+    def __init__(self, since: int, maxlen: int):
+        # このイベント番号より後のイベントは全て保持している
+        self.since = since
+        self.events: deque[tuple[int, MemoEvent]] = deque(maxlen=maxlen)
+
+
+# プロセス内のPub/Sub(既定、ワーカーが1つの場合)
+class MemoryEventBroker(EventBroker):
+    def __init__(self, history_size: int, history_users: int, queue_size: int):
+        """
+        Args:
+            history_size(int): ユーザーごとに保持する直近のイベント数(再開用)
+            history_users(int): イベントを保持する最大ユーザー数
+            queue_size(int): 購読者ごとの未送信イベントの上限(超えた場合は reset)
+        """
+        self._epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._history_size = history_size
+        self._history = TTLCache(maxsize=history_users)
+        self._queue_size = queue_size
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self._epoch}-{seq}"
+
+    # イベントIDからイベント番号を取得(他のプロセス・再起動前のIDの場合はNone)
+    def _parse_event_id(self, event_id: str) -> int | None:
+        epoch, _, seq = event_id.partition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _reset_event(self) -> MemoEvent:
+        return MemoEvent(id=self._event_id(self._seq), type="reset")
+
+    async def publish(self, user_id: int, event_type: str, data: dict[str, Any]):
+        self._seq += 1
+        event = MemoEvent(id=self._event_id(self._seq), type=event_type, data=data)
+        history = self._get_history(user_id, since=self._seq - 1)
+        if len(history.events) == history.events.maxlen:
+            # 最も古いイベントが削除されるため、そのイベント以降のみ再開可能
+            history.since = history.events[0][0]
+        history.events.append((self._seq, event))
+
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # 受信が追いつかないクライアントは未送信分を破棄して再取得させる
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._reset_event())
+
+    # ユーザーのイベント履歴取得(無い場合は since 以降のイベントを保持する履歴を作成)
+    def _get_history(self, user_id: int, since: int) -> _EventHistory:
+        history = self._history.get(user_id)
+        if history is None:
+            history = _EventHistory(since=since, maxlen=self._history_size)
+            self._history.set(user_id, history)
+        return history
+
+    # 再開時に送信するイベント(受信済みのイベントより後のイベント)
+    def _replay(self, user_id: int, last_event_id: str | None) -> list[MemoEvent]:
+        # 購読中は履歴を作成しておき、イベントが無い間も再開できるようにする
+        history = self._get_history(user_id, since=self._seq)
+        if last_event_id is None:
+            return []
+        last_seq = self._parse_event_id(last_event_id)
+        if last_seq is None or last_seq < history.since:
+            return [self._reset_event()]
+        return [event for seq, event in history.events if seq > last_seq]
+
+    async def subscribe(
+        self, user_id: int, last_event_id: str | None, timeout: float
+    ) -> AsyncIterator[MemoEvent | None]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        # 履歴の取得と購読の登録の間にイベントが発行されないよう、awaitを挟まずに行う
+        replay = self._replay(user_id, last_event_id)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            for event in replay:
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+
+# Redis互換サーバーのPub/Sub(複数ワーカーの場合、Redis Streamsを使用)
+# redisパッケージが必要(pip install redis)
+class RedisEventBroker(EventBroker):
+    def __init__(self, url: str, history_size: int, namespace: str = "events"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redisバックエンドを使用するには redis パッケージが必要です。"
+            ) from e
+        self._client = redis.from_url(url)
+        self._history_size = history_size
+        self._namespace = namespace
+
+    def _key(self, user_id: int) -> str:
+        return f"{self._namespace}:{user_id}"
+
+    async def publish(self, user_id: int, event_type: str, data: dict[str, Any]):
+        await self._client.xadd(
+            self._key(user_id),
+            {"type": event_type, "data": json.dumps(data, default=str)},
+            maxlen=self._history_size,
+            approximate=True,
+        )
+
+    async def subscribe(
+        self, user_id: int, last_event_id: str | None, timeout: float
+    ) -> AsyncIterator[MemoEvent | None]:
+        key = self._key(user_id)
+        # 購読開始時点の最新のイベント(以降のイベントを取得する)
+        latest = await self._client.xrevrange(key, count=1)
+        position = latest[0][0].decode() if latest else "0-0"
+        if last_event_id:
+            last = _stream_id(last_event_id)
+            oldest = await self._client.xrange(key, count=1)
+            if last is not None and not (oldest and _stream_id(oldest[0][0]) > last):
+                position = last_event_id
+            else:
+                # 受信済みのイベントが削除されている場合は再取得させる
+                yield MemoEvent(id=position, type="reset")
+        while True:
+            response = await self._client.xread(
+                {key: position}, block=int(timeout * 1000)
+            )
+            if not response:
+                yield None
+                continue
+            for entry_id, fields in response[0][1]:
+                position = entry_id.decode()
+                yield MemoEvent(
+                    id=position,
+                    type=fields[b"type"].decode(),
+                    data=json.loads(fields[b"data"]),
+                )
+
+
+# Redis StreamsのID(ミリ秒-連番)の比較用(形式が異なる場合はNone)
+def _stream_id(value: str | bytes) -> tuple[int, int] | None:
+    if isinstance(value, bytes):
+        value = value.decode()
+    millis, _, seq = value.partition("-")
+    if not millis.isdigit() or not (seq or "0").isdigit():
+        return None
+    return int(millis), int(seq or 0)
+
+
+# 設定に応じたPub/Subの作成
+def create_event_broker(
+    backend: str, history_size: int, history_users: int, queue_size: int
+) -> EventBroker:
+    if backend == "redis":
+        from config import get_settings
+
+        return RedisEventBroker(get_settings().redis_url, history_size=history_size)
+    return MemoryEventBroker(
+        history_size=history_size,
+        history_users=history_users,
+        queue_size=queue_size,
+    )
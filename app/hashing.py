@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import get_settings
+
+# ============================================
+# パスワードハッシュ化
+# ============================================
+# PBKDF2の反復回数(変更すると既存ユーザーのパスワードが一致しなくなる)
+PBKDF2_ITERATIONS = 1000
+
+# ハッシュ化用のワーカープール(初回使用時に作成)
+_executor: Executor | None = None
+# 実行中・待機中のハッシュ化処理数の上限
+_semaphore: asyncio.Semaphore | None = None
+
+
+# パスワードハッシュ化(同期処理)
+# プロセスプールで実行するため、モジュールのトップレベルに定義
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations).hex()
+
+
+# ワーカープール取得
+def _get_executor() -> Executor | None:
+    global _executor
+    settings = get_settings()
+    if _executor is None and settings.password_hash_executor != "inline":
+        if settings.password_hash_executor == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                thread_name_prefix="password-hash",
+            )
+    return _executor
+
+
+# 同時実行数制限用のセマフォ取得
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_settings().password_hash_max_pending)
+    return _semaphore
+
+
+async def hash_password(password: str, salt: bytes) -> str:
+    """
+    パスワードをPBKDF2でハッシュ化する関数
+    CPU負荷の高い処理のため、ワーカープールで実行しイベントループを止めない
+    上限を超えた要求は空きが出るまで待機する
+    Args:
+        password(str): 平文のパスワード
+        salt(bytes): ソルト
+    Returns:
+        str: ハッシュ化されたパスワード(16進数文字列)
+    """
+    executor = _get_executor()
+    if executor is None:
+        # inline指定時はイベントループ上で直接実行
+        return _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, _pbkdf2, password, salt, PBKDF2_ITERATIONS
+        )
+
+
+# ワーカープールの停止(アプリ終了時)
+def shutdown_executor():
+    global _executor, _semaphore
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+    _executor = None
+    _semaphore = None
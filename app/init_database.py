@@ -1,36 +1,268 @@
-import os
-from sqlalchemy.ext.asyncio import create_async_engine
-from models.memo import Base as memo_Base
-from models.auth import Base as auth_Base
+import sys
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import AsyncEngine
+from models.memo import Base as memo_Base, Memo, fts_user_key_sql
+from models.auth import Base as auth_Base, User
+from models.audit import AuditLog
+import db
 import asyncio
 
 # ============================================
 # DB作成＆テーブル作成
 # ============================================
-# DBファイル作成
-base_dir = os.path.dirname(__file__)
+# 接続先はアプリと同じ(config.Settings.database_url)
 
-# データベースのURL
-DATABASE_URL = "sqlite+aiosqlite:///" + os.path.join(base_dir, "memodb.sqlite")
+# スキーマのバージョン管理用テーブル(アプリのモデルとは別に管理)
+migration_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    migration_metadata,
+    Column("version", Integer, nullable=False),
+)
 
-# 非同期エンジンの作成
-engine = create_async_engine(DATABASE_URL, echo=True)
+
+# ============================================
+# マイグレーション
+# ============================================
+# 各処理は同期コネクションを受け取る(run_syncで実行)
+# 既存のテーブル・データは削除せず、不足分のみ追加する
+
+
+# テーブル作成(存在するテーブルはそのまま)
+def _create_tables(conn):
+    memo_Base.metadata.create_all(conn)
+    auth_Base.metadata.create_all(conn)
+
+
+# 指定した名前のインデックス作成(モデルの定義から作成、存在するものはそのまま)
+# モデルに後から追加したインデックスは、その列を追加するマイグレーションより前に
+# 作成できないため、マイグレーションごとに作成するインデックスを固定する
+def _create_indexes(conn, names: list[str]):
+    indexes = {
+        index.name: index
+        for table in (User.__table__, Memo.__table__)
+        for index in table.indexes
+    }
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+# 一覧取得・ログイン用のインデックス作成
+def _create_login_indexes(conn):
+    # ユーザー名が重複している場合、ユニークインデックスを作成できない
+    duplicated = conn.execute(
+        select(User.username).group_by(User.username).having(func.count() > 1).limit(1)
+    ).scalar()
+    if duplicated is not None:
+        raise RuntimeError(
+            f"ユーザー名 '{duplicated}' が重複しているため、"
+            "ユニークインデックスを作成できません。"
+        )
+    _create_indexes(
+        conn,
+        ["ix_users_username", "ix_memos_user_id_memo_id", "ix_memos_user_id_is_check"],
+    )
+
+
+# 絞り込み・並べ替え用のインデックス作成
+def _create_sort_indexes(conn):
+    _create_indexes(
+        conn,
+        [
+            "ix_memos_user_id_created_at",
+            "ix_memos_user_id_updated_at",
+            "ix_memos_user_id_title",
+        ],
+    )
+
+
+# 更新日時が未設定のメモに作成日時を設定
+def _fill_memo_updated_at(conn):
+    conn.execute(
+        update(Memo.__table__)
+        .where(Memo.updated_at.is_(None))
+        .values(updated_at=Memo.created_at)
+    )
+
+
+# 全文検索用のインデックス作成(DBの種類ごと)
+# SQLite: FTS5仮想テーブル + トリガーでmemosと同期
+#   日本語は単語の区切りが無いため、trigram(3文字単位)で分割する
+#   本文はmemosから取得するため、索引のみ保持する(contentless)
+#   user_key で検索対象を絞り込み、他ユーザーのメモの件数に影響されないようにする
+# PostgreSQL: tsvectorの式インデックス(GIN)、トリガー不要
+def _sqlite_search_values(row: str) -> str:
+    return (
+        f"{row}.memo_id, {fts_user_key_sql(row + '.user_id')}, "
+        f"{row}.title, {row}.description"
+    )
+
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memos_fts USING fts5("
+    "user_key, title, description, content='', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS memos_fts_insert AFTER INSERT ON memos BEGIN "
+    "INSERT INTO memos_fts(rowid, user_key, title, description) "
+    f"VALUES ({_sqlite_search_values('new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS memos_fts_delete AFTER DELETE ON memos BEGIN "
+    "INSERT INTO memos_fts(memos_fts, rowid, user_key, title, description) "
+    f"VALUES ('delete', {_sqlite_search_values('old')}); END",
+    "CREATE TRIGGER IF NOT EXISTS memos_fts_update "
+    "AFTER UPDATE OF title, description, user_id ON memos BEGIN "
+    "INSERT INTO memos_fts(memos_fts, rowid, user_key, title, description) "
+    f"VALUES ('delete', {_sqlite_search_values('old')}); "
+    "INSERT INTO memos_fts(rowid, user_key, title, description) "
+    f"VALUES ({_sqlite_search_values('new')}); END",
+    # 既存のメモを索引に登録
+    "INSERT INTO memos_fts(rowid, user_key, title, description) "
+    f"SELECT {_sqlite_search_values('memos')} FROM memos",
+]
+POSTGRES_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_memos_search ON memos USING GIN "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))",
+]
+
+
+def _create_search_index(conn):
+    statements = {
+        "sqlite": SQLITE_SEARCH_DDL,
+        "postgresql": POSTGRES_SEARCH_DDL,
+    }.get(conn.dialect.name, [])
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# 全文検索用の仮想テーブル削除(memosの削除時にトリガーは削除される)
+def _drop_search_index(conn):
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("DROP TABLE IF EXISTS memos_fts"))
+
+
+# 既存のテーブルに不足している列を追加(モデルの定義から作成)
+def _add_columns(conn, table: Table, names: list[str]):
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column}"))
+
+
+# メモのリビジョン・削除日時(差分取得用)の追加
+# 既存のメモのリビジョンにはmemo_idを設定する(ユーザー内で一意かつ登録順)
+def _add_memo_revision(conn):
+    _add_columns(conn, User.__table__, ["memo_revision"])
+    _add_columns(conn, Memo.__table__, ["revision", "deleted_at"])
+    conn.execute(
+        update(Memo.__table__).where(Memo.revision == 0)
+        # メモの更新日時は変更しない
+        .values(revision=Memo.memo_id, updated_at=Memo.updated_at)
+    )
+    last_revision = (
+        select(func.max(Memo.revision))
+        .where(Memo.user_id == User.user_id)
+        .scalar_subquery()
+    )
+    conn.execute(
+        update(User.__table__)
+        .where(User.memo_revision == 0)
+        .values(
+            memo_revision=func.coalesce(last_revision, 0),
+            # ユーザーの更新日時は変更しない
+            updated_at=User.updated_at,
+        )
+    )
+    _create_indexes(conn, ["ix_memos_user_id_revision"])
+
+
+# 監査ログのテーブル作成(インデックスを含む、存在する場合はそのまま)
+def _create_audit_logs(conn):
+    AuditLog.__table__.create(conn, checkfirst=True)
+
+
+# マイグレーション一覧(バージョン, 説明, 処理)
+# 追加する場合は末尾にバージョンを増やして追記する
+MIGRATIONS = [
+    (1, "テーブル作成", _create_tables),
+    (2, "users.username, memos.user_id のインデックス作成", _create_login_indexes),
+    (3, "memos.updated_at の補完", _fill_memo_updated_at),
+    (4, "memos の全文検索インデックス作成", _create_search_index),
+    (5, "memos の絞り込み・並べ替え用インデックス作成", _create_sort_indexes),
+    (6, "memos のリビジョン・削除日時(差分取得用)の追加", _add_memo_revision),
+    (7, "refresh_tokens テーブル作成", _create_tables),
+    (8, "audit_logs テーブル作成", _create_audit_logs),
+]
+
+
+# 適用済みのスキーマバージョン取得
+def _get_schema_version(conn) -> int:
+    migration_metadata.create_all(conn)
+    version = conn.execute(select(schema_version.c.version)).scalar()
+    return version or 0
+
+
+# 適用済みのスキーマバージョン保存
+def _set_schema_version(conn, version: int):
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(version=version))
+
+
+# データベースのマイグレーション(未適用の処理のみ実行)
+async def migrate_db(target_engine: AsyncEngine | None = None):
+    print("=== データベースのマイグレーションを開始 ===")
+    target_engine = target_engine or db.get_engine()
+    async with target_engine.begin() as conn:
+        current = await conn.run_sync(_get_schema_version)
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        # 1バージョンずつトランザクションを分けて適用
+        async with target_engine.begin() as conn:
+            await conn.run_sync(migration)
+            await conn.run_sync(_set_schema_version, version)
+        print(f">>> バージョン{version}を適用しました：{description}")
+    print(">>> マイグレーション完了")
 
 
 # データベースの初期化
 # SQLAlucehmy に非同期関数ないため、外部から非同期にしている。
-async def init_db():
+async def init_db(target_engine: AsyncEngine | None = None):
     print("=== データベースの初期化を開始 ===")
-    async with engine.begin() as conn:
+    target_engine = target_engine or db.get_engine()
+    async with target_engine.begin() as conn:
         # 既存のテーブルを削除
+        await conn.run_sync(_drop_search_index)
         await conn.run_sync(memo_Base.metadata.drop_all)
         await conn.run_sync(auth_Base.metadata.drop_all)
+        await conn.run_sync(migration_metadata.drop_all)
         print(">>> 既存のテーブルを削除しました。")
-        # テーブルを作成
-        await conn.run_sync(memo_Base.metadata.create_all)
-        await conn.run_sync(auth_Base.metadata.create_all)
+    # テーブルを作成
+    await migrate_db(target_engine)
+
+
+# スクリプト実行時の処理(終了前にコネクションプールを閉じる)
+async def main(reset: bool):
+    try:
+        if reset:
+            await init_db()
+        else:
+            await migrate_db()
+    finally:
+        await db.dispose_engine()
 
 
 # スクリプトで実行時のみ実行
+# 通常はマイグレーションのみ、--reset 指定時は全テーブルを削除して再作成
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    asyncio.run(main(reset="--reset" in sys.argv[1:]))
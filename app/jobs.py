@@ -0,0 +1,214 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import metrics
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# ジョブキュー(書き込み後の副作用の非同期実行)
+# ============================================
+# 変更通知・監査ログ等、レスポンスに必要ない処理をリクエストの外で実行する
+# キーを指定したジョブは同じワーカーが登録順に実行する(ユーザー単位の変更通知の順序を保つ)
+# キューが満杯の場合、登録はワーカーが追いつくまで待機する(メモリを際限なく使わない)
+# キューが起動していない場合(lifespanを実行しないテスト・スクリプト等)はその場で実行する
+# (リクエストを待たせないため、その場で実行したジョブは失敗しても再試行しない)
+
+
+@dataclass(slots=True)
+class Job:
+    name: str
+    payload: Any
+    # 登録時刻(time.monotonic()基準、待ち時間の計測用)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+# ジョブの処理関数
+# batch=False: handler(payload)、batch=True: handler([payload, ...])(連続する同じ名前のジョブをまとめる)
+@dataclass(frozen=True, slots=True)
+class _Handler:
+    func: Callable[[Any], Awaitable[None]]
+    batch: bool
+
+
+class JobQueue:
+    def __init__(
+        self,
+        workers: int,
+        maxsize: int,
+        max_retries: int,
+        retry_delay: float,
+        batch_size: int,
+    ):
+        """
+        Args:
+            workers(int): ワーカー数(キューもワーカーごとに分ける)
+            maxsize(int): キュー全体の最大件数(ワーカー数で等分)
+            max_retries(int): 失敗したジョブの再試行回数
+            retry_delay(float): 最初の再試行までの秒数(再試行のたびに2倍)
+            batch_size(int): まとめて処理する最大件数
+        """
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.batch_size = batch_size
+        self._handlers: dict[str, _Handler] = {}
+        self._queues: list[asyncio.Queue] = []
+        # キューごとの未処理のジョブの登録時刻(キューと同じ順序、遅延の計測用)
+        self._pending: list[deque[float]] = []
+        self._tasks: list[asyncio.Task] = []
+        self._round_robin = itertools.count()
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def register(self, name: str, func: Callable, batch: bool = False):
+        self._handlers[name] = _Handler(func, batch)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def enqueue(self, name: str, payload: Any, key: int | None = None):
+        """
+        ジョブを登録する
+        Args:
+            name(str): ジョブの名前(register で登録した名前)
+            payload(Any): 処理関数に渡す値
+            key(int | None): 順序を保つ単位(ユーザーID等)、Noneの場合は順序を保証しない
+        """
+        job = Job(name, payload)
+        if not self.running:
+            await self._run([job], retry=False)
+            return
+        index = (next(self._round_robin) if key is None else key) % self.workers
+        await self._queues[index].put(job)
+        self._pending[index].append(job.enqueued_at)
+
+    def start(self):
+        if self.running:
+            return
+        size = max(1, self.maxsize // self.workers)
+        self._queues = [asyncio.Queue(maxsize=size) for _ in range(self.workers)]
+        self._pending = [deque() for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"job-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float | None = None):
+        """
+        登録済みのジョブを全て実行してからワーカーを停止する
+        Args:
+            timeout(float | None): 待機する最大秒数、超えた場合は残りのジョブを破棄
+        """
+        if not self.running:
+            return
+        tasks, self._tasks = self._tasks, []
+
+        # 以降の登録はその場で実行される
+        # 停止の合図をキューの末尾に追加し、それまでのジョブを実行させる
+        async def drain():
+            for queue in self._queues:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except TimeoutError:
+            logger.error(
+                "ジョブキューの停止がタイムアウトしました。",
+                extra={"dropped": self.depth()},
+            )
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _worker(self, index: int):
+        queue, pending = self._queues[index], self._pending[index]
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            jobs = [job]
+            # 待機中のジョブをまとめて取り出す(停止の合図の後は取り出さない)
+            while len(jobs) < self.batch_size and not queue.empty():
+                job = queue.get_nowait()
+                if job is None:
+                    queue.put_nowait(None)
+                    break
+                jobs.append(job)
+            now = time.monotonic()
+            for job in jobs:
+                pending.popleft()
+                metrics.observe_job_wait(now - job.enqueued_at)
+            await self._run(jobs)
+
+    # 連続する同じ名前のジョブごとに実行(batchの処理関数にはまとめて渡す)
+    async def _run(self, jobs: list[Job], retry: bool = True):
+        retries = self.max_retries if retry else 0
+        for name, group in itertools.groupby(jobs, key=lambda job: job.name):
+            handler = self._handlers[name]
+            payloads = [job.payload for job in group]
+            if handler.batch:
+                await self._call(name, handler.func, payloads, len(payloads), retries)
+            else:
+                for payload in payloads:
+                    await self._call(name, handler.func, payload, 1, retries)
+
+    # 処理関数の実行(失敗した場合は間隔を空けて最大retries回再試行)
+    async def _call(
+        self, name: str, func: Callable, arg: Any, count: int, retries: int
+    ):
+        for attempt in range(retries + 1):
+            try:
+                await func(arg)
+                self.processed += count
+                return
+            except Exception:
+                if attempt == retries:
+                    self.failed += count
+                    logger.exception(
+                        "ジョブの実行に失敗しました。",
+                        extra={"job": name, "count": count},
+                    )
+                    return
+                self.retried += count
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+    # 未処理のジョブ数
+    def depth(self) -> int:
+        return sum(len(pending) for pending in self._pending)
+
+    # 最も古い未処理のジョブの待ち時間(秒)
+    def lag(self) -> float:
+        oldest = min((pending[0] for pending in self._pending if pending), default=None)
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "lag_seconds": self.lag(),
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+# アプリ全体で共有するジョブキュー(lifespanで起動・停止)
+job_queue = JobQueue(
+    workers=get_settings().job_queue_workers,
+    maxsize=get_settings().job_queue_size,
+    max_retries=get_settings().job_max_retries,
+    retry_delay=get_settings().job_retry_delay_seconds,
+    batch_size=get_settings().job_batch_size,
+)
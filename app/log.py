@@ -0,0 +1,102 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime
+from typing import TextIO
+
+from config import Settings, get_settings
+
+# ============================================
+# ログ出力
+# ============================================
+# 各モジュールでは logging.getLogger(__name__) を使用する
+# 出力処理はバックグラウンドのスレッドで行い、イベントループを止めない
+
+# 出力用のリスナー(setup_logging で開始)
+_listener: logging.handlers.QueueListener | None = None
+
+# LogRecordの標準の属性(これ以外は extra で渡された項目として出力)
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+# 1行1件のJSON形式で出力するフォーマッター
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# 指定した割合のログのみ通すフィルター(SQLログの間引き用)
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return random.random() < self.rate
+
+
+def setup_logging(settings: Settings | None = None, stream: TextIO | None = None):
+    """
+    ログ出力を設定する関数(アプリ起動時に呼び出す)
+    Args:
+        settings(Settings | None): 設定、Noneの場合はget_settings()
+        stream(TextIO | None): 出力先、Noneの場合は標準出力
+    """
+    global _listener
+    settings = settings or get_settings()
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue: queue.Queue = queue.Queue(-1)
+    _listener = logging.handlers.QueueListener(
+        log_queue, output, respect_handler_level=True
+    )
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(settings.log_level)
+    # コネクションプールのログ(破棄・再作成等)はルートのレベルを引き継がない
+    # (出力する場合は LOG_LEVELS で sqlalchemy.pool のレベルを指定)
+    logging.getLogger("sqlalchemy.pool").setLevel(logging.WARNING)
+    # モジュール単位のログレベル(例: {"cruds.memo": "DEBUG"})
+    for name, level in settings.log_levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    # SQLのログ(指定した割合のみ出力)
+    sql_logger = logging.getLogger("sqlalchemy.engine.Engine")
+    for log_filter in list(sql_logger.filters):
+        if isinstance(log_filter, SamplingFilter):
+            sql_logger.removeFilter(log_filter)
+    if settings.sql_log_sample_rate > 0:
+        sql_logger.addFilter(SamplingFilter(settings.sql_log_sample_rate))
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    elif not settings.db_echo:
+        # ルートのログレベルを引き継いで全SQLが出力されないようにする
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+
+# ログ出力の停止(キューに残っているログは出力してから停止)
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
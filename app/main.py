@@ -1,14 +1,52 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
 from routers.memo import router as memo_router
 from routers.auth import router as auth_router
+from routers.metrics import router as metrics_router
+from routers.health import router as health_router
+import cruds.auth as auth_crud
+import cruds.memo as memo_crud
+from compression import CompressionMiddleware
+from config import get_settings
+import hashing
+import db
+import jobs
+import log
+import metrics
+import startup
+
 
 # ===========================================
 # 起動ファイル
 # ===========================================
-app = FastAPI()
+# アプリの起動・終了時の処理
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ログ出力の設定
+    log.setup_logging()
+    # 書き込み後の処理(変更通知・監査ログ等)を実行するジョブキューのワーカーを起動
+    jobs.job_queue.start()
+    # DB接続・ワーカーの起動等の初期化(完了後に /readyz が200を返す)
+    await startup.warm_up(app)
+    yield
+    # 終了処理中はリクエストを受け付けない状態にする
+    startup.state.ready = False
+    # パスワードハッシュ化のワーカープールを停止
+    hashing.shutdown_executor()
+    # 登録済みのジョブを実行してからワーカーを停止(監査ログの書き込みのためDBより先)
+    await jobs.job_queue.stop(timeout=settings.job_drain_timeout_seconds)
+    # DBのコネクションプールを閉じる
+    await db.dispose_engine()
+    # キューに残っているログを出力して停止
+    log.shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+settings = get_settings()
 
 # CORS設定
 app.add_middleware(
@@ -21,12 +59,38 @@ app.add_middleware(
     allow_methods=["*"],
     # 許可するHTTPヘッダーを指定
     allow_headers=["*"],
+    # JavaScriptから参照を許可するレスポンスヘッダーを指定
+    expose_headers=["ETag", "X-Next-Cursor", "X-Next-Offset", "Retry-After"],
+    # プリフライトの結果をキャッシュさせ、メモのAPIを呼ぶたびにOPTIONSを送らせない
+    # (Chromeは最大7200秒)
+    max_age=settings.cors_max_age,
 )
 
+# レスポンスの圧縮(Accept-Encoding: br, zstd, gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+    zstd_level=settings.compression_zstd_level,
+    cache_size=settings.compression_cache_size,
+)
+
+# リクエストの処理時間・ステータスコードの計測
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 # ルーターのマウント
 app.include_router(memo_router)  # メインページ
 app.include_router(auth_router)  # 認証ページ
+app.include_router(metrics_router)  # メトリクス
+app.include_router(health_router)  # 死活監視・準備状態
+
+# キャッシュの統計をメトリクスに出力
+metrics.cache_stats["token"] = auth_crud.token_cache.stats
+metrics.cache_stats["user"] = auth_crud.user_cache.stats
+metrics.cache_stats["memo_list"] = memo_crud.memo_list_cache.stats
+metrics.queue_stats["jobs"] = jobs.job_queue.stats
 
 
 # バリデーションエラーのカスタムハンドラ
@@ -0,0 +1,173 @@
+import csv
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+
+from schemas.memo import InsertAndUpdateMemoSchema
+
+# ============================================
+# メモのインポート(アップロードされたNDJSON・CSVの解析)
+# ============================================
+# リクエストの本文を受信した分ずつ行に分けて解析し、1行ずつ返す
+# (ファイル全体をメモリに載せないため、行数に関わらずメモリ使用量は一定)
+# 解析結果は (行番号, 登録するメモ or エラー内容) で返し、エラーの行は登録せずに続ける
+# CSVはエクスポートと同じ列名のヘッダー行が必要(title以外は省略可、memo_id, user_idは無視)
+
+# CSVで読み込む列
+CSV_FIELDS = ("title", "description", "is_check")
+
+
+# ファイル全体を読み込めない場合のエラー(CSVのヘッダー不正等)
+class ImportFormatError(ValueError):
+    pass
+
+
+# 行が長すぎる場合に iter_lines が返す値
+LINE_TOO_LONG = None
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[bytes | None]:
+    """
+    受信したbytesを改行で区切って1行ずつ返す関数
+    (UTF-8のマルチバイト文字に改行のバイトは含まれないため、デコード前に区切る)
+    Args:
+        chunks(AsyncIterator[bytes]): リクエストの本文(request.stream())
+        max_line_bytes(int): 1行の最大バイト数、超えた行は読み飛ばしてLINE_TOO_LONGを返す
+    Yields:
+        bytes | None: 改行を除いた行、長すぎる行の場合はLINE_TOO_LONG
+    """
+    buffer = b""
+    # 長すぎる行の残りを読み飛ばしている間True
+    skipping = False
+    async for chunk in chunks:
+        if skipping:
+            end = chunk.find(b"\n")
+            if end == -1:
+                continue
+            chunk, skipping = chunk[end + 1 :], False
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line if len(line) <= max_line_bytes else LINE_TOO_LONG
+        if len(buffer) > max_line_bytes:
+            yield LINE_TOO_LONG
+            buffer, skipping = b"", True
+    if buffer:
+        yield buffer
+
+
+# 検証エラーを1行のメッセージに変換
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+        for error in exc.errors(include_url=False)
+    )
+
+
+async def parse_ndjson(
+    lines: AsyncIterator[bytes | None],
+) -> AsyncIterator[tuple[int, InsertAndUpdateMemoSchema | str]]:
+    """
+    NDJSON(1行に1つのメモのJSON)を解析する関数(空行は無視)
+    Args:
+        lines(AsyncIterator[bytes | None]): iter_lines の結果
+    Yields:
+        tuple[int, InsertAndUpdateMemoSchema | str]: (行番号, メモ or エラー内容)
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is LINE_TOO_LONG:
+            yield line_number, "行が長すぎます"
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_number, InsertAndUpdateMemoSchema.model_validate_json(line)
+        except ValidationError as exc:
+            yield line_number, _format_validation_error(exc)
+
+
+async def _iter_csv_records(
+    lines: AsyncIterator[bytes | None], max_record_bytes: int
+) -> AsyncIterator[tuple[int, list[str] | str]]:
+    # 引用符で囲まれた値に改行を含む場合は複数行を1レコードにまとめる
+    # (引用符の数が偶数になった時点でレコードの終わり)
+    line_number = start = 0
+    record: list[str] = []
+    quotes = size = 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            start = line_number
+        if line is LINE_TOO_LONG:
+            record, quotes, size = [], 0, 0
+            yield start, "行が長すぎます"
+            continue
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            record, quotes, size = [], 0, 0
+            yield start, "UTF-8として読み込めません"
+            continue
+        if line_number == 1:
+            text = text.removeprefix("\ufeff")
+        record.append(text.removesuffix("\r") + "\n")
+        quotes += text.count('"')
+        size += len(line)
+        if quotes % 2 == 0:
+            if record != ["\n"]:
+                yield start, next(csv.reader(record))
+            record, quotes, size = [], 0, 0
+        elif size > max_record_bytes:
+            record, quotes, size = [], 0, 0
+            yield start, "引用符が閉じられていないか、レコードが長すぎます"
+    if record:
+        yield start, "引用符が閉じられていません"
+
+
+async def parse_csv(
+    lines: AsyncIterator[bytes | None], max_record_bytes: int
+) -> AsyncIterator[tuple[int, InsertAndUpdateMemoSchema | str]]:
+    """
+    CSV(1行目はヘッダー)を解析する関数(空行は無視)
+    Args:
+        lines(AsyncIterator[bytes | None]): iter_lines の結果
+        max_record_bytes(int): 1レコードの最大バイト数
+    Yields:
+        tuple[int, InsertAndUpdateMemoSchema | str]: (レコードの開始行番号, メモ or エラー内容)
+    Raises:
+        ImportFormatError: ヘッダー行が無い、またはtitle列が無い場合
+    """
+    header: list[str] | None = None
+    async for line_number, record in _iter_csv_records(lines, max_record_bytes):
+        if header is None:
+            if isinstance(record, str):
+                raise ImportFormatError(f"ヘッダー行を読み込めません: {record}")
+            header = [name.strip() for name in record]
+            if "title" not in header:
+                raise ImportFormatError("ヘッダー行にtitle列がありません")
+            columns = [
+                (index, name) for index, name in enumerate(header) if name in CSV_FIELDS
+            ]
+            continue
+        if isinstance(record, str):
+            yield line_number, record
+            continue
+        if len(record) != len(header):
+            yield line_number, f"列数がヘッダー({len(header)}列)と一致しません"
+            continue
+        # 空欄のis_checkは既定値(False)にする
+        values = {
+            name: record[index]
+            for index, name in columns
+            if not (name == "is_check" and record[index] == "")
+        }
+        try:
+            yield line_number, InsertAndUpdateMemoSchema.model_validate(values)
+        except ValidationError as exc:
+            yield line_number, _format_validation_error(exc)
+    if header is None:
+        raise ImportFormatError("ヘッダー行がありません")
@@ -0,0 +1,225 @@
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from contextvars import ContextVar
+
+# ============================================
+# メトリクス(Prometheusのテキスト形式で出力)
+# ============================================
+# 計測処理はリクエストごとに極力メモリを確保しないようにしている
+# (バケットは事前に確保し、ラベルの組み合わせごとのオブジェクトは初回のみ作成)
+
+# 処理時間のバケット(秒)
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 1リクエストあたりのSQL発行数のバケット
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ヒストグラム
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # 末尾は +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Prometheusのテキスト形式(累積のバケット)
+    def render(self, name: str, labels: str = "") -> list[str]:
+        prefix = labels + "," if labels else ""
+        suffix = "{" + labels + "}" if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+# ============================================
+# 計測値
+# ============================================
+# 処理中のリクエスト数
+requests_in_flight = 0
+# (メソッド, ルート) -> 処理時間のヒストグラム
+request_latency: dict[tuple[str, str], Histogram] = {}
+# (メソッド, ルート, ステータスコード) -> レスポンス数
+responses_total: dict[tuple[str, str, int], int] = {}
+# SQLの実行時間
+query_latency = Histogram(LATENCY_BUCKETS)
+# 1リクエストあたりのSQL発行数
+queries_per_request = Histogram(QUERY_COUNT_BUCKETS)
+# コネクションプールからの取得待ち時間
+pool_checkout_wait = Histogram(LATENCY_BUCKETS)
+# ジョブキューに登録されてから実行が始まるまでの時間
+job_wait = Histogram(LATENCY_BUCKETS)
+
+# 処理中のリクエストのSQL発行数(リクエストごとに [件数] を設定)
+_request_queries: ContextVar[list[int] | None] = ContextVar(
+    "request_queries", default=None
+)
+
+
+# ============================================
+# DBの計測(db.py のエンジンに登録)
+# ============================================
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    query_latency.observe(time.perf_counter() - context._metrics_start)
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def observe_pool_checkout_wait(seconds: float):
+    pool_checkout_wait.observe(seconds)
+
+
+# ジョブキューの計測(jobs.py のワーカーから呼び出す)
+def observe_job_wait(seconds: float):
+    job_wait.observe(seconds)
+
+
+# ============================================
+# リクエストの計測(ASGIミドルウェア)
+# ============================================
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global requests_in_flight
+        status = 500
+        counter = [0]
+        token = _request_queries.set(counter)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight -= 1
+            _request_queries.reset(token)
+            # ルートのパス(/memos/{memo_id} 等)単位で集計し、ラベルの種類を抑える
+            route = scope.get("route")
+            key = (scope["method"], route.path if route else "unmatched")
+            histogram = request_latency.get(key)
+            if histogram is None:
+                histogram = request_latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(elapsed)
+            status_key = (*key, status)
+            responses_total[status_key] = responses_total.get(status_key, 0) + 1
+            queries_per_request.observe(counter[0])
+
+
+# ============================================
+# 出力
+# ============================================
+# キャッシュの統計(名前 -> stats()を返す関数)
+cache_stats: dict[str, Callable[[], dict]] = {}
+# 出力するキャッシュの統計(項目, 種類)
+CACHE_METRICS = (
+    ("hits", "counter"),
+    ("misses", "counter"),
+    ("size", "gauge"),
+    ("memory_bytes", "gauge"),
+)
+# ジョブキューの統計(名前 -> stats()を返す関数)
+queue_stats: dict[str, Callable[[], dict]] = {}
+# 出力するジョブキューの統計(項目, 種類)
+QUEUE_METRICS = (
+    ("depth", "gauge"),
+    ("lag_seconds", "gauge"),
+    ("processed", "counter"),
+    ("failed", "counter"),
+    ("retried", "counter"),
+)
+
+
+def render() -> str:
+    """
+    計測値をPrometheusのテキスト形式で出力する関数
+    Returns:
+        str: /metrics のレスポンス
+    """
+    lines = [
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {requests_in_flight}",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), histogram in list(request_latency.items()):
+        lines += histogram.render(
+            "http_request_duration_seconds", f'method="{method}",route="{route}"'
+        )
+    lines.append("# TYPE http_responses_total counter")
+    for (method, route, status), count in list(responses_total.items()):
+        lines.append(
+            f'http_responses_total{{method="{method}",route="{route}",'
+            f'status="{status}"}} {count}'
+        )
+    lines.append("# TYPE db_query_duration_seconds histogram")
+    lines += query_latency.render("db_query_duration_seconds")
+    lines.append("# TYPE db_queries_per_request histogram")
+    lines += queries_per_request.render("db_queries_per_request")
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    lines += pool_checkout_wait.render("db_pool_checkout_wait_seconds")
+    all_stats = {name: get_stats() for name, get_stats in cache_stats.items()}
+    for metric, metric_type in CACHE_METRICS:
+        name = (
+            f"cache_{metric}_total" if metric_type == "counter" else f"cache_{metric}"
+        )
+        lines.append(f"# TYPE {name} {metric_type}")
+        for cache, stats in all_stats.items():
+            if metric in stats:
+                lines.append(f'{name}{{cache="{cache}"}} {stats[metric]}')
+    lines.append("# TYPE job_queue_wait_seconds histogram")
+    lines += job_wait.render("job_queue_wait_seconds")
+    all_stats = {name: get_stats() for name, get_stats in queue_stats.items()}
+    for metric, metric_type in QUEUE_METRICS:
+        name = (
+            f"job_queue_{metric}_total"
+            if metric_type == "counter"
+            else f"job_queue_{metric}"
+        )
+        lines.append(f"# TYPE {name} {metric_type}")
+        for queue, stats in all_stats.items():
+            lines.append(f'{name}{{queue="{queue}"}} {stats[metric]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from db import Base
+
+
+# ============================================
+# モデル
+# ============================================
+# 監査ログ：メモの登録・更新・削除の記録(ジョブキューからまとめて書き込む)
+class AuditLog(Base):
+    # テーブル名
+    __tablename__ = "audit_logs"
+    # インデックス
+    __table_args__ = (
+        # ユーザー単位の監査ログ取得(登録順)用
+        Index("ix_audit_logs_user_id_audit_id", "user_id", "audit_id"),
+    )
+    # 監査ログID：PK：自動インクリメント
+    audit_id = Column(Integer, primary_key=True, autoincrement=True)
+    # 操作したユーザーのID(ユーザー削除後も記録を残すため外部キーにしない)
+    user_id = Column(Integer, nullable=False)
+    # 操作：insert, update, delete
+    action = Column(String(20), nullable=False)
+    # 対象のメモID
+    memo_id = Column(Integer, nullable=True)
+    # 操作後のリビジョン
+    revision = Column(Integer, nullable=True)
+    # 詳細(JSON)
+    detail = Column(Text, nullable=True)
+    # 操作日時(書き込み時ではなく、操作時の日時)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
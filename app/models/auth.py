@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from db import Base
 
@@ -11,6 +11,11 @@ from db import Base
 class User(Base):
     # テーブル名
     __tablename__ = "users"
+    # インデックス
+    __table_args__ = (
+        # ログイン時のユーザー名検索用(ユーザー名の重複も防止)
+        Index("ix_users_username", "username", unique=True),
+    )
     # ユーザーID：PK：自動インクリメント
     user_id = Column(Integer, primary_key=True, autoincrement=True)
     # ユーザー名：未入力不可
@@ -20,9 +25,44 @@ class User(Base):
     # ソルト
     salt = Column(String, nullable=False)
     # 生成日
-    created_at = Column(DateTime, default=datetime.now())
+    created_at = Column(DateTime, default=datetime.now)
     # 更新日
-    updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # メモのリビジョン：最後に割り当てたメモのリビジョン
+    memo_revision = Column(Integer, nullable=False, default=0, server_default="0")
 
     # リレーション
     memos = relationship("Memo", back_populates="user")
+
+
+# リフレッシュトークン(アクセストークンの再発行用)
+# トークンは再発行のたびに新しいものに置き換える(ローテーション)
+# 同じログインから発行されたトークンは family_id が同じ(ログアウト時はまとめて失効)
+class RefreshToken(Base):
+    # テーブル名
+    __tablename__ = "refresh_tokens"
+    # インデックス
+    __table_args__ = (
+        # トークンの検索用
+        Index("ix_refresh_tokens_token_hash", "token_hash", unique=True),
+        # ログアウト時の失効用
+        Index("ix_refresh_tokens_family_id", "family_id"),
+    )
+    # トークンID：PK：自動インクリメント
+    token_id = Column(Integer, primary_key=True, autoincrement=True)
+    # トークンのハッシュ値(SHA-256)：トークンそのものは保存しない
+    token_hash = Column(String(64), nullable=False)
+    # ログイン単位のID(アクセストークンの sid と同じ値)
+    family_id = Column(String(32), nullable=False)
+    # ユーザーID：未入力不可
+    user_id = Column(
+        Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False
+    )
+    # 生成日
+    created_at = Column(DateTime, default=datetime.now)
+    # 有効期限
+    expires_at = Column(DateTime, nullable=False)
+    # 使用日時：再発行に使用済みの場合のみ設定(再度使用された場合は漏洩とみなす)
+    used_at = Column(DateTime, nullable=True)
+    # 失効日時：ログアウト・漏洩検知により失効した場合のみ設定
+    revoked_at = Column(DateTime, nullable=True)
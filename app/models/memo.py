@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    Boolean,
+    ForeignKey,
+    Index,
+    MetaData,
+    Table,
+)
 from sqlalchemy.orm import relationship
 
 from datetime import datetime
@@ -13,6 +23,20 @@ from db import Base
 class Memo(Base):
     # テーブル名
     __tablename__ = "memos"
+    # インデックス
+    __table_args__ = (
+        # ユーザー単位のメモ一覧取得(memo_id順)用
+        Index("ix_memos_user_id_memo_id", "user_id", "memo_id"),
+        # ユーザー単位のチェック状況による絞り込み用
+        Index("ix_memos_user_id_is_check", "user_id", "is_check"),
+        # ユーザー単位の作成日時・更新日時・タイトルによる絞り込み・並べ替え用
+        # 同じ値のメモはmemo_id順に並べるため、memo_idも含める
+        Index("ix_memos_user_id_created_at", "user_id", "created_at", "memo_id"),
+        Index("ix_memos_user_id_updated_at", "user_id", "updated_at", "memo_id"),
+        Index("ix_memos_user_id_title", "user_id", "title", "memo_id"),
+        # ユーザー単位の差分取得(リビジョン順)用
+        Index("ix_memos_user_id_revision", "user_id", "revision"),
+    )
     # メモID：PK：自動インクリメント
     memo_id = Column(Integer, primary_key=True, autoincrement=True)
     # タイトル：未入力不可
@@ -26,9 +50,51 @@ class Memo(Base):
         Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False
     )
     # 作成日時
-    created_at = Column(DateTime, default=datetime.now())
-    # 更新日時
-    updated_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.now)
+    # 更新日時(更新のたびに自動で設定)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    # リビジョン：登録・更新・削除のたびにユーザー単位で増加する番号(users.memo_revision)
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    # 削除日時：削除済み(差分取得用に残している)の場合のみ設定
+    deleted_at = Column(DateTime, nullable=True)
 
     # リレーション
     user = relationship("User", back_populates="memos")
+
+
+# ============================================
+# 全文検索用：SQLiteのFTS5仮想テーブル(init_databaseで作成、トリガーでmemosと同期)
+# ============================================
+# rowid は memos.memo_id と同じ値
+# アプリのモデルとは別に管理(create_all/drop_allの対象外)
+memo_search_metadata = MetaData()
+memos_fts = Table(
+    "memos_fts",
+    memo_search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    # ユーザーを表す3文字(trigramの1語になる)、検索対象をユーザーのメモに絞り込む
+    Column("user_key", String),
+    Column("title", String),
+    Column("description", String),
+)
+
+# user_key に使用する文字(CJK統合漢字)の開始位置と種類数
+FTS_USER_KEY_BASE = 0x4E00
+FTS_USER_KEY_RADIX = 20000
+
+
+# ユーザーIDからuser_keyを作成
+def fts_user_key(user_id: int) -> str:
+    return "".join(
+        chr(FTS_USER_KEY_BASE + user_id // FTS_USER_KEY_RADIX**exp % FTS_USER_KEY_RADIX)
+        for exp in (2, 1, 0)
+    )
+
+
+# fts_user_key と同じ値を作成するSQL式(トリガー内で使用)
+def fts_user_key_sql(user_id_column: str) -> str:
+    return " || ".join(
+        f"char({FTS_USER_KEY_BASE} + {user_id_column} / {FTS_USER_KEY_RADIX**exp} "
+        f"% {FTS_USER_KEY_RADIX})"
+        for exp in (2, 1, 0)
+    )
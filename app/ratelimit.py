@@ -0,0 +1,210 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+
+from config import get_settings
+
+# ============================================
+# レート制限(トークンバケット)
+# ============================================
+# キー(制限の名前 + IPアドレス・ユーザーID)ごとにバケットを持ち、
+# リクエストのたびにトークンを1つ消費する(空の場合は429を返す)
+# トークンは期間あたりの回数の割合で補充され、最大で回数分まで貯まる(バースト)
+
+# 期間の単位(秒)
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+# 制限値
+@dataclass(frozen=True)
+class RateLimit:
+    # 期間あたりの回数(バケットの容量)
+    count: int
+    # 期間(秒)
+    period: float
+
+    # 1秒あたりに補充されるトークン数
+    @property
+    def rate(self) -> float:
+        return self.count / self.period
+
+
+def parse_rate_limit(value: str) -> RateLimit:
+    """
+    "回数/期間" 形式の文字列を制限値に変換する関数
+    Args:
+        value(str): 制限値(例: "10/minute", "1000/day")、期間は second, minute, hour, day
+    Returns:
+        RateLimit: 制限値
+    """
+    count, _, period = value.partition("/")
+    if not count.strip().isdigit() or int(count) <= 0 or period.strip() not in _PERIODS:
+        raise ValueError(f"レート制限の形式が不正です: {value!r}")
+    return RateLimit(count=int(count), period=_PERIODS[period.strip()])
+
+
+# ============================================
+# バケットの保存先
+# ============================================
+class RateLimitStore:
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        """
+        トークンを1つ消費する
+        Args:
+            key(str): バケットのキー
+            limit(RateLimit): 制限値
+        Returns:
+            float: 0の場合は消費できた、それ以外は次にトークンが補充されるまでの秒数
+        """
+        raise NotImplementedError
+
+
+# プロセス内のバケット(既定、ワーカーが1つの場合)
+# 各バケットは補充を最後の更新時にまとめて計算するため、1回の確認はO(1)
+class MemoryRateLimitStore(RateLimitStore):
+    # 1回の確認で削除を試みる未使用バケットの数
+    EVICT_PER_CALL = 2
+
+    def __init__(self, max_buckets: int):
+        """
+        Args:
+            max_buckets(int): 保持する最大バケット数
+                超えた場合は最も古く使用されたものから削除(そのキーの制限はリセットされる)
+        """
+        self._max_buckets = max_buckets
+        # キー -> [トークン数, 更新時刻, 満タンになる時刻](時刻はtime.monotonic()基準)
+        # 最も古く使用されたものが先頭
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        self._evict_idle(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(limit.count)
+        else:
+            tokens = min(limit.count, bucket[0] + (now - bucket[1]) * limit.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        full_at = now + (limit.count - tokens) / limit.rate
+        self._buckets[key] = [tokens, now, full_at]
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self._max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+    # 満タンまで補充されたバケットを削除(存在しない場合と同じ状態のため)
+    # 先頭(最も古く使用されたもの)から一定数のみ確認し、確認の計算量を一定に保つ
+    def _evict_idle(self, now: float):
+        for _ in range(self.EVICT_PER_CALL):
+            if not self._buckets:
+                return
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket[2] > now:
+                return
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Redis互換サーバーのバケット(複数ワーカーで共有する場合)
+# ワーカー間で競合せずINCRのみで更新できるよう、期間ごとの固定ウィンドウで回数を数える
+# (トークンバケットと異なり、ウィンドウの境界の前後では最大で2倍の回数を許可する)
+# redisパッケージが必要(pip install redis)
+class RedisRateLimitStore(RateLimitStore):
+    def __init__(self, url: str, namespace: str = "ratelimit"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redisバックエンドを使用するには redis パッケージが必要です。"
+            ) from e
+        self._client = redis.from_url(url)
+        self._namespace = namespace
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        # ワーカー間で同じウィンドウになるよう、時刻はtime.time()基準
+        now = time.time()
+        window = int(now // limit.period)
+        window_key = f"{self._namespace}:{key}:{window}"
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.incr(window_key)
+            # 次のウィンドウが終わるまでに削除(ウィンドウごとにキーが変わるため延長されない)
+            pipe.pexpire(window_key, int(limit.period * 2000))
+            count, _ = await pipe.execute()
+        if count <= limit.count:
+            return 0.0
+        return (window + 1) * limit.period - now
+
+
+# 設定に応じた保存先の作成
+def create_rate_limit_store(backend: str, max_buckets: int) -> RateLimitStore:
+    if backend == "redis":
+        return RedisRateLimitStore(get_settings().redis_url)
+    return MemoryRateLimitStore(max_buckets=max_buckets)
+
+
+# 全ての制限で共有する保存先
+rate_limit_store: RateLimitStore = create_rate_limit_store(
+    get_settings().rate_limit_backend,
+    max_buckets=get_settings().rate_limit_max_buckets,
+)
+
+
+# ============================================
+# 制限の確認
+# ============================================
+class RateLimiter:
+    def __init__(self, name: str, store: RateLimitStore | None = None):
+        """
+        Args:
+            name(str): 制限の名前(Settings.rate_limits のキー)、未設定の場合は制限しない
+            store(RateLimitStore | None): バケットの保存先、Noneの場合は共有の保存先
+        """
+        settings = get_settings()
+        value = settings.rate_limits.get(name)
+        self.name = name
+        self.limit = (
+            parse_rate_limit(value) if value and settings.rate_limit_enabled else None
+        )
+        self.store = store or rate_limit_store
+
+    async def check(self, key: str):
+        """
+        トークンを1つ消費し、空の場合はHTTP 429エラーを発生させる
+        Args:
+            key(str): 制限の単位(IPアドレス、ユーザーID等)
+        """
+        if self.limit is None:
+            return
+        wait = await self.store.acquire(f"{self.name}:{key}", self.limit)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="リクエストが多すぎます。しばらくしてから再度お試しください。",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+
+# クライアントのIPアドレス
+# プロキシ経由の場合は uvicorn --proxy-headers 等で X-Forwarded-For を反映させる
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# IPアドレス単位で制限する依存関係の作成
+def limit_by_ip(name: str):
+    limiter = RateLimiter(name)
+
+    async def dependency(request: Request):
+        await limiter.check(client_ip(request))
+
+    return dependency
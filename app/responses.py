@@ -0,0 +1,40 @@
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import Response
+
+# orjsonがインストールされている場合は使用(pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ============================================
+# JSONレスポンス
+# ============================================
+def dumps(content: Any) -> bytes:
+    """
+    JSON(bytes)に変換する関数
+    orjsonが無い場合はpydanticのシリアライザーを使用
+    Args:
+        content(Any): dict, list, datetime 等から構成される値
+    Returns:
+        bytes: JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return pydantic_core.to_json(content)
+
+
+# 値を直接bytesに変換するJSONレスポンス
+# エンドポイントから返すとresponse_modelによる検証・変換が行われないため、
+# 内容がresponse_modelと一致していることは呼び出し側で保証する
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # シリアライズ済みのJSONはそのまま返す
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -1,6 +1,6 @@
 from datetime import timedelta
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -9,8 +9,11 @@ from schemas.auth import (
     UserResponseSchema,
     UserCreateSchema,
     TokenSchema,
+    RefreshTokenSchema,
 )
 from models.auth import User
+from config import get_settings
+from ratelimit import limit_by_ip
 import db
 
 # ルーターを作成し、タグとURLパスのプレフィックスを認定
@@ -25,12 +28,20 @@ router = APIRouter(tags=["Auth"], prefix="/auth")
     "/signup",
     response_model=UserResponseSchema,
     status_code=status.HTTP_201_CREATED,
+    # IPアドレス単位で制限(ユーザーの大量登録を防ぐ)
+    dependencies=[Depends(limit_by_ip("signup"))],
 )
 async def create_user(
     user_create: UserCreateSchema,
     db_session: AsyncSession = Depends(db.get_dbsession),
 ):
-    new_user: User = await auth_crud.create_user(db_session, user_create)
+    new_user: User | None = await auth_crud.create_user(db_session, user_create)
+    if not new_user:
+        # ユーザー名が既に使用されている場合、HTTP 409エラーを返す
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="このユーザー名は既に使用されています",
+        )
 
     return UserResponseSchema(
         id=new_user.user_id,
@@ -42,8 +53,14 @@ async def create_user(
 
 # ログインのエンドポイント
 # レスポンスでトークンを返し、Authorizationヘッダーへの格納を期待
-# TODO:トークン保存期間が直値
-@router.post("/login", status_code=status.HTTP_200_OK, response_model=TokenSchema)
+# アクセストークンの期限切れ時は、リフレッシュトークンで再発行する(/auth/refresh)
+# IPアドレス単位で制限(パスワードハッシュ化によるCPU負荷・総当たりを防ぐ)
+@router.post(
+    "/login",
+    status_code=status.HTTP_200_OK,
+    response_model=TokenSchema,
+    dependencies=[Depends(limit_by_ip("login"))],
+)
 async def login(
     db_session: AsyncSession = Depends(db.get_dbsession),
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -57,7 +74,64 @@ async def login(
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
-    token = auth_crud.create_access_token(
-        user.username, user.user_id, timedelta(minutes=20)
+    refresh_token, session_id = await auth_crud.create_refresh_token(
+        db_session, user.user_id
+    )
+    token = _create_access_token(user.username, user.user_id, session_id)
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+# アクセストークン再発行のエンドポイント
+# パスワードの検証を行わずに再発行する(リフレッシュトークンは新しいものに置き換わる)
+@router.post(
+    "/refresh",
+    status_code=status.HTTP_200_OK,
+    response_model=TokenSchema,
+    dependencies=[Depends(limit_by_ip("refresh"))],
+)
+async def refresh(
+    body: RefreshTokenSchema,
+    db_session: AsyncSession = Depends(db.get_dbsession),
+):
+    rotated = await auth_crud.rotate_refresh_token(db_session, body.refresh_token)
+    if not rotated:
+        # 期限切れ・使用済み・失効済みの場合は再ログインが必要
+        raise HTTPException(status_code=401, detail="リフレッシュトークンが無効です")
+
+    refresh_token, user = rotated
+    token = _create_access_token(user.username, user.user_id, user.session_id)
+    return {
+        "access_token": token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+    }
+
+
+# ログアウトのエンドポイント
+# リフレッシュトークンのログインを失効させる(発行済みのアクセストークンも使用不可)
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(limit_by_ip("refresh"))],
+)
+async def logout(
+    body: RefreshTokenSchema,
+    db_session: AsyncSession = Depends(db.get_dbsession),
+):
+    # 存在しないトークンの場合も成功とする(ログアウト済みと同じ状態のため)
+    await auth_crud.revoke_refresh_token(db_session, body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+# アクセストークン生成(有効期間は設定値)
+def _create_access_token(username: str, user_id: int, session_id: str | None) -> str:
+    return auth_crud.create_access_token(
+        username,
+        user_id,
+        timedelta(minutes=get_settings().access_token_expire_minutes),
+        session_id,
     )
-    return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import startup
+
+# ルーターを作成し、タグを認定
+router = APIRouter(tags=["Health"])
+
+
+# ============================================
+# 死活監視・準備状態のエンドポイント
+# ============================================
+# プロセスが応答できるか(起動処理の完了を待たない)
+@router.get("/healthz", include_in_schema=False)
+def get_health():
+    return {"status": "ok"}
+
+
+# リクエストを受け付けられるか(起動処理の完了前・終了処理中は503)
+@router.get("/readyz", include_in_schema=False)
+def get_readiness():
+    if not startup.state.ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready"})
+    return {"status": "ready", "startup_ms": startup.state.timings}
@@ -1,24 +1,85 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+import time
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 from schemas.memo import (
     InsertAndUpdateMemoSchema,
     MemoSchema,
+    MemoListQuerySchema,
+    MemoChangesSchema,
     ResponseSchema,
     UsernameSchema,
+    BatchInsertMemoSchema,
+    BatchUpdateMemoSchema,
+    BatchDeleteMemoSchema,
+    BatchItemResultSchema,
+    BatchResponseSchema,
+    MemoImportResultSchema,
 )
 from schemas.auth import DecodedTokenSchema
 import cruds.memo as memo_crud
 import cruds.auth as auth_crud
 import db
+from config import get_settings
+from events import MemoEvent
+from responses import FastJSONResponse, dumps
+from ratelimit import RateLimiter
+import memo_import
+
+# ============================================
+# レート制限(ユーザー単位、参照系と更新系で別に制限)
+# ============================================
+_read_limiter = RateLimiter("memo_read")
+_write_limiter = RateLimiter("memo_write")
+
+
+async def _limit_memo_requests(
+    request: Request, user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token)
+):
+    limiter = _read_limiter if request.method in ("GET", "HEAD") else _write_limiter
+    await limiter.check(str(user.user_id))
+
 
 # ルーターを作成し、タグとURLパスのプレフィックスを認定
-router = APIRouter(tags=["Memos"], prefix="/memos")
+# 全てのエンドポイントにレート制限を適用
+router = APIRouter(
+    tags=["Memos"], prefix="/memos", dependencies=[Depends(_limit_memo_requests)]
+)
+
+
+# ============================================
+# 条件付きGET(ETag)
+# ============================================
+# メモの登録・更新・削除のたびに変わるユーザー単位の世代番号からETagを生成
+# (メモの読み込み・シリアライズ無しで生成できる)
+def _make_etag(user_id: int, version: str, memo_id: int | None = None) -> str:
+    if memo_id is None:
+        return f'W/"memos-{user_id}-{version}"'
+    return f'W/"memo-{user_id}-{memo_id}-{version}"'
+
+
+# If-None-Matchヘッダーに一致するETagが含まれるか判定(弱い比較)
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag.removeprefix("W/")
+        for tag in header.split(",")
+    )
 
 
 # ============================================
 # メモ用のエンドポイント
 # ============================================
+# メモを返すエンドポイントは、DBから取得した行を直接JSONに変換して返す
+# (FastJSONResponseを返すため、response_modelによる検証・変換は行われない)
+# 既定ではTypeAdapterで検証してから変換し、MEMO_FAST_SERIALIZATION=true の場合は検証を省略する
 # メモ新規登録のエンドポイント
 @router.post("/", response_model=ResponseSchema)
 async def create_memo(
@@ -32,20 +93,307 @@ async def create_memo(
         # 新しいメモをデータベースに登録
         await memo_crud.insert_memo(db, memo, user_id)
         return ResponseSchema(message="メモが正常に登録されました")
+    except HTTPException:
+        # ユーザーが存在しない場合(HTTP 404エラー)はそのまま返す
+        raise
     except Exception:
         # 登録に失敗した場合、HTTP 400エラーを返す
         raise HTTPException(status_code=400, detail="メモの登録に失敗しました。")
 
 
-# ユーザー単位でメモ情報全件取得のエンドポイント
+# ユーザー単位でメモ情報取得のエンドポイント
+# is_check, 作成日時・更新日時の範囲で絞り込み、sort, orderで並べ替え(既定はmemo_id順)
+# limit指定時はX-Next-Cursorヘッダーに次ページのカーソル(after)を返す
+# stream=trueの場合はNDJSON形式で全件をストリーミングで返す
 @router.get("/", response_model=list[MemoSchema])
 async def get_memos_list(
+    request: Request,
+    list_query: MemoListQuerySchema = Depends(),
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    after: int | None = Query(default=None, ge=0),
+    stream: bool = False,
     db: AsyncSession = Depends(db.get_dbsession),
     user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
 ):
+    if stream:
+        return StreamingResponse(
+            _stream_memos_ndjson(db.bind, user.user_id, after, list_query),
+            media_type="application/x-ndjson",
+        )
+
+    if limit is None and after is None and list_query == MemoListQuerySchema():
+        version = await memo_crud.get_memo_list_version(user.user_id)
+        etag = _make_etag(user.user_id, version)
+        if _etag_matches(request, etag):
+            # 前回取得時から変更が無い場合、HTTP 304を返す
+            return Response(status_code=304, headers={"ETag": etag})
+        # 全件取得はキャッシュ済みのJSONをそのまま返す
+        content = await memo_crud.get_memo_list_json(db, user.user_id, version)
+        return FastJSONResponse(content, headers={"ETag": etag})
+
     # Cookieのuser_id(ログイン中のuser_id)のmemo取得
-    memos = await memo_crud.get_memos_by_user_id(db, user.user_id)
-    return memos
+    memos = await memo_crud.get_memos_by_user_id(
+        db, user.user_id, limit=limit, after=after, list_query=list_query
+    )
+    if memos is None:
+        # カーソルのメモが削除されている場合、HTTP 400エラーを返す
+        raise HTTPException(status_code=400, detail="カーソルが無効です")
+    response = FastJSONResponse(memo_crud.dump_memo_list_json(memos))
+    if limit is not None and len(memos) == limit:
+        # 取得件数が上限に達した場合、次ページが存在する可能性がある
+        response.headers["X-Next-Cursor"] = str(memos[-1].memo_id)
+    return response
+
+
+# メモをNDJSON形式で少しずつ返すジェネレーター
+# レスポンス送信中はエンドポイントのセッションが閉じられているため、
+# エンドポイントのセッションと同じエンジンで専用のセッションを使用
+async def _stream_memos_ndjson(
+    bind: AsyncEngine,
+    user_id: int,
+    after: int | None,
+    list_query: MemoListQuerySchema,
+):
+    async with db.async_session(bind) as db_session:
+        async for memos in memo_crud.stream_memos_by_user_id(
+            db_session, user_id, after=after, list_query=list_query
+        ):
+            yield b"".join(memo_crud.dump_memo_json(memo) + b"\n" for memo in memos)
+
+
+# メモ検索のエンドポイント(タイトル・詳細の全文検索、関連度順)
+# 次ページが存在する可能性がある場合はX-Next-Offsetヘッダーに次ページのoffsetを返す
+# /{memo_id} より前に定義する必要がある
+@router.get("/search", response_model=list[MemoSchema])
+async def search_memos(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0, le=10000),
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    memos = await memo_crud.search_memos(db, user.user_id, q, limit, offset)
+    response = FastJSONResponse(memo_crud.dump_memo_list_json(memos))
+    if len(memos) == limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return response
+
+
+# メモの差分取得のエンドポイント
+# since(前回取得したrevision)より後に登録・更新・削除されたメモのみを返す
+# 初回・再取得時は since=0 で全件を取得し、以降は返されたrevisionを指定する
+# has_more が True の場合は、返されたrevisionを指定して続きを取得する
+# /{memo_id} より前に定義する必要がある
+@router.get("/changes", response_model=MemoChangesSchema)
+async def get_memo_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=1000),
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    # 1件多く取得して続きの有無を判定
+    rows = await memo_crud.get_memo_changes(db, user.user_id, since, limit + 1)
+    return FastJSONResponse(
+        memo_crud.dump_memo_changes_json(
+            rows[:limit], since, has_more=len(rows) > limit
+        )
+    )
+
+
+# メモの変更通知のエンドポイント(Server-Sent Events)
+# 他の端末・タブでの登録・更新・削除をイベントとして送信する(一覧のポーリングの代わり)
+# 再接続時はLast-Event-IDヘッダーに受信済みの最後のイベントIDを指定すると、その後から再開
+# resetイベントを受信した場合は一覧を再取得する
+# /{memo_id} より前に定義する必要がある
+@router.get("/stream")
+async def stream_memo_events(
+    last_event_id: str | None = Header(default=None, max_length=100),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    return StreamingResponse(
+        _memo_event_stream(user.user_id, last_event_id),
+        media_type="text/event-stream",
+        # プロキシでバッファリングさせない
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# イベントをSSE形式で送信するジェネレーター
+# 接続が長時間になるとトークンの期限切れを検知できないため、一定時間で終了し再接続させる
+async def _memo_event_stream(user_id: int, last_event_id: str | None):
+    settings = get_settings()
+    deadline = time.monotonic() + settings.memo_event_stream_seconds
+    # 切断時にクライアントが再接続するまでの待ち時間(ミリ秒)
+    yield b"retry: 3000\n\n"
+    events = memo_crud.memo_events.subscribe(
+        user_id, last_event_id, timeout=settings.memo_event_heartbeat_seconds
+    )
+    try:
+        async for event in events:
+            yield _format_event(event)
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        await events.aclose()
+
+
+# SSEのメッセージ作成(イベントが無い場合は接続維持用のコメント)
+def _format_event(event: MemoEvent | None) -> bytes:
+    if event is None:
+        return b": ping\n\n"
+    return (
+        f"id: {event.id}\nevent: {event.type}\ndata: ".encode()
+        + dumps(event.data)
+        + b"\n\n"
+    )
+
+
+# ============================================
+# 一括処理のエンドポイント
+# /{memo_id} より前に定義する必要がある
+# ============================================
+# メモ一括登録のエンドポイント
+@router.post("/batch", response_model=BatchResponseSchema)
+async def create_memos_batch(
+    batch: BatchInsertMemoSchema,
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    memo_ids = await memo_crud.insert_memos(db, batch.memos, user.user_id)
+    return BatchResponseSchema(
+        message=f"{len(memo_ids)}件のメモが正常に登録されました",
+        results=[
+            BatchItemResultSchema(index=index, memo_id=memo_id, status="created")
+            for index, memo_id in enumerate(memo_ids)
+        ],
+    )
+
+
+# メモ一括更新のエンドポイント(チェック状況の切り替え等)
+@router.patch("/batch", response_model=BatchResponseSchema)
+async def modify_memos_batch(
+    batch: BatchUpdateMemoSchema,
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    updated_ids = await memo_crud.update_memos(db, batch.memos, user.user_id)
+    return BatchResponseSchema(
+        message=f"{len(updated_ids)}件のメモが正常に更新されました",
+        results=[
+            BatchItemResultSchema(
+                index=index,
+                memo_id=target.memo_id,
+                status="updated" if target.memo_id in updated_ids else "not_found",
+            )
+            for index, target in enumerate(batch.memos)
+        ],
+    )
+
+
+# メモ一括削除のエンドポイント
+@router.delete("/batch", response_model=BatchResponseSchema)
+async def remove_memos_batch(
+    batch: BatchDeleteMemoSchema,
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    deleted_ids = await memo_crud.delete_memos(db, batch.memo_ids, user.user_id)
+    return BatchResponseSchema(
+        message=f"{len(deleted_ids)}件のメモが正常に削除されました",
+        results=[
+            BatchItemResultSchema(
+                index=index,
+                memo_id=memo_id,
+                status="deleted" if memo_id in deleted_ids else "not_found",
+            )
+            for index, memo_id in enumerate(batch.memo_ids)
+        ],
+    )
+
+
+# ============================================
+# エクスポート・インポートのエンドポイント
+# /{memo_id} より前に定義する必要がある
+# ============================================
+# インポートのContent-Typeと形式の対応(formatの指定が無い場合に使用)
+_IMPORT_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+# メモのエクスポートのエンドポイント(削除済みを除く全件、memo_id順)
+# サーバーサイドカーソルから少しずつ読み込んで送信するため、件数に関わらずメモリ使用量は一定
+@router.get("/export")
+async def export_memos(
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    if export_format == "csv":
+        return StreamingResponse(
+            _stream_memos_csv(db.bind, user.user_id),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="memos.csv"'},
+        )
+    return StreamingResponse(
+        _stream_memos_ndjson(db.bind, user.user_id, None, MemoListQuerySchema()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="memos.ndjson"'},
+    )
+
+
+# メモをCSV形式で少しずつ返すジェネレーター(先頭はヘッダー行)
+async def _stream_memos_csv(bind: AsyncEngine, user_id: int):
+    yield memo_crud.dump_memos_csv([], header=True)
+    async with db.async_session(bind) as db_session:
+        async for memos in memo_crud.stream_memos_by_user_id(db_session, user_id):
+            yield memo_crud.dump_memos_csv(memos)
+
+
+# メモのインポートのエンドポイント
+# リクエストの本文(NDJSON または CSV)を受信しながら解析し、
+# MEMO_IMPORT_CHUNK_SIZE 件ごとに1トランザクションで登録する
+# 形式は format で指定(省略時は Content-Type から判定)
+# エラーの行は登録せずに続け、結果に行番号とエラー内容を返す
+# 進捗はチャンクの登録ごとに /memos/stream へ import イベントで通知する
+@router.post("/import", response_model=MemoImportResultSchema)
+async def import_memos(
+    request: Request,
+    import_format: Literal["ndjson", "csv"] | None = Query(
+        default=None, alias="format"
+    ),
+    db: AsyncSession = Depends(db.get_dbsession),
+    user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
+):
+    if import_format is None:
+        content_type = request.headers.get("content-type", "")
+        import_format = _IMPORT_FORMATS.get(content_type.split(";")[0].strip().lower())
+        if import_format is None:
+            raise HTTPException(
+                status_code=415,
+                detail="format(ndjson, csv)またはContent-Typeを指定してください",
+            )
+    settings = get_settings()
+    lines = memo_import.iter_lines(
+        request.stream(), settings.memo_import_max_line_bytes
+    )
+    if import_format == "csv":
+        rows = memo_import.parse_csv(lines, settings.memo_import_max_line_bytes)
+    else:
+        rows = memo_import.parse_ndjson(lines)
+    try:
+        return await memo_crud.import_memos(
+            db,
+            rows,
+            user.user_id,
+            chunk_size=settings.memo_import_chunk_size,
+            max_errors=settings.memo_import_max_errors,
+        )
+    except memo_import.ImportFormatError as exc:
+        # ヘッダー行の不正等(1件も登録していない)
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 # ユーザー名取得(フロントエンド用)
@@ -61,9 +409,14 @@ def read_token_me(token: DecodedTokenSchema = Depends(auth_crud.get_jwt_token)):
 @router.get("/{memo_id}", response_model=MemoSchema)
 async def get_memo_detail(
     memo_id: int,
+    request: Request,
     db: AsyncSession = Depends(db.get_dbsession),
     user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
 ):
+    # メモより先に世代番号を取得する(取得中に更新された場合は古いETagになり、次回は再取得される)
+    version = await memo_crud.get_memo_list_version(user.user_id)
+    etag = _make_etag(user.user_id, version, memo_id)
+
     # 指定されたIDのメモをデータベースから取得
     memo = await memo_crud.get_memo_by_id(db, memo_id)
 
@@ -76,7 +429,12 @@ async def get_memo_detail(
         raise HTTPException(
             status_code=404, detail="該当ユーザーのメモが見つかりません"
         )
-    return memo
+
+    # 存在・所有者を確認した後に比較する(削除済み・他ユーザーのメモに304を返さない)
+    if _etag_matches(request, etag):
+        # 前回取得時から変更が無い場合、HTTP 304を返す
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(memo_crud.dump_memo_json(memo), headers={"ETag": etag})
 
 
 # ユーザー単位で設定
@@ -88,19 +446,13 @@ async def modify_memo(
     db: AsyncSession = Depends(db.get_dbsession),
     user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
 ):
-    # ユーザーIDチェック
-    memo_chk = await memo_crud.get_memo_by_id(db, memo_id)
-    if memo_chk.user_id != user.user_id:
-        # ログイン中のユーザーidと取得したメモのユーザーidが異なる場合、HTTP 404エラーを返す
+    # ログイン中のユーザーのメモに限り、指定されたIDのメモを新しいデータで更新
+    updated_memo = await memo_crud.update_memo(db, memo_id, memo_target, user.user_id)
+    if not updated_memo:
+        # 更新対象が見つからない(他ユーザーのメモを含む)場合、HTTP 404エラーを返す
         raise HTTPException(
             status_code=404, detail="該当ユーザーのメモが見つかりません"
         )
-
-    # 指定されたIDのメモを新しいデータで更新
-    updated_memo = await memo_crud.update_memo(db, memo_id, memo_target)
-    if not updated_memo:
-        # 更新対象が見つからない場合、HTTP 404エラーを返す
-        raise HTTPException(status_code=404, detail="更新対象が見つかりません")
     return ResponseSchema(message="メモが正常に更新されました")
 
 
@@ -111,18 +463,12 @@ async def remove_memo(
     db: AsyncSession = Depends(db.get_dbsession),
     user: DecodedTokenSchema = Depends(auth_crud.get_jwt_token),
 ):
-    # ユーザーIDチェック
-    memo = await memo_crud.get_memo_by_id(db, memo_id)
-    if memo.user_id != user.user_id:
-        # ログイン中のユーザーidと取得したメモのユーザーidが異なる場合、HTTP 404エラーを返す
+    # ログイン中のユーザーのメモに限り、指定されたIDのメモをデータベースから削除
+    deleted = await memo_crud.delete_memo(db, memo_id, user.user_id)
+    if not deleted:
+        # 削除対象が見つからない(他ユーザーのメモを含む)場合、HTTP 404エラーを返す
         raise HTTPException(
             status_code=404, detail="該当ユーザーのメモが見つかりません"
         )
 
-    # 指定されたIDのメモをデータベースから削除
-    result = await memo_crud.delete_memo(db, memo_id)
-    if not result:
-        # 削除対象が見つからない場合、HTTP 404エラーを返す
-        raise HTTPException(status_code=404, detail="削除対象が見つかりません")
-
     return ResponseSchema(message="メモが正常に削除されました")
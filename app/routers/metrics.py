@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import metrics
+
+# ルーターを作成し、タグを認定
+router = APIRouter(tags=["Metrics"])
+
+
+# ============================================
+# 監視用のエンドポイント
+# ============================================
+# メトリクス取得のエンドポイント(Prometheusのテキスト形式)
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -23,9 +23,18 @@ class UserResponseSchema(BaseModel):
 class TokenSchema(BaseModel):
     access_token: str
     token_type: str
+    # アクセストークンの再発行用(/auth/refresh)
+    refresh_token: str | None = None
+
+
+# トークン再発行・ログアウト時のスキーマ
+class RefreshTokenSchema(BaseModel):
+    refresh_token: str = Field(min_length=1, max_length=100)
 
 
 # デコードされたトークンのスキーマ
 class DecodedTokenSchema(BaseModel):
     username: str
     user_id: int
+    # ログイン単位のID(リフレッシュトークンの family_id、ログアウト時に失効)
+    session_id: str | None = None
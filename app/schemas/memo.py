@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
 
 
 # ===========================================
@@ -63,3 +66,124 @@ class UsernameSchema(BaseModel):
         description="ユーザー名",
         example="hoge",
     )
+
+
+# メモ一覧の絞り込み・並べ替え条件(クエリパラメーター)
+class MemoListQuerySchema(BaseModel):
+    is_check: bool | None = Field(default=None, description="チェック状況で絞り込み")
+    created_from: datetime | None = Field(
+        default=None, description="作成日時がこの日時以降のメモに絞り込み"
+    )
+    created_to: datetime | None = Field(
+        default=None, description="作成日時がこの日時より前のメモに絞り込み"
+    )
+    updated_from: datetime | None = Field(
+        default=None, description="更新日時がこの日時以降のメモに絞り込み"
+    )
+    updated_to: datetime | None = Field(
+        default=None, description="更新日時がこの日時より前のメモに絞り込み"
+    )
+    sort: Literal["memo_id", "created_at", "updated_at", "title"] = Field(
+        default="memo_id", description="並べ替えに使用する項目"
+    )
+    order: Literal["asc", "desc"] = Field(
+        default="asc", description="並び順(asc: 昇順, desc: 降順)"
+    )
+
+
+# メモの差分取得の結果スキーマ
+class MemoChangesSchema(BaseModel):
+    revision: int = Field(
+        ...,
+        description="取得した変更の最後のリビジョン(次回のsinceに指定する)",
+        example=123,
+    )
+    has_more: bool = Field(
+        ..., description="True: 続きの変更が存在する(revisionを指定して再取得する)"
+    )
+    memos: list[MemoSchema] = Field(..., description="登録・更新されたメモのリスト")
+    deleted: list[int] = Field(..., description="削除されたメモのIDのリスト")
+
+
+# 一括処理で一度に扱える最大件数
+BATCH_MAX_ITEMS = 1000
+
+
+# 一括登録で使用するスキーマ
+class BatchInsertMemoSchema(BaseModel):
+    memos: list[InsertAndUpdateMemoSchema] = Field(
+        ...,
+        description="登録するメモのリスト",
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+    )
+
+
+# 一括更新の1件分のスキーマ(指定した項目のみ更新)
+class BatchUpdateItemSchema(BaseModel):
+    memo_id: int = Field(..., description="更新するメモのID", example=123)
+    title: str | None = Field(default=None, min_length=1, example="明日のアジェンダ")
+    description: str | None = Field(default=None)
+    is_check: bool | None = Field(default=None, example=True)
+
+    # 更新する項目が1つもない場合はエラー
+    @model_validator(mode="after")
+    def check_any_field(self):
+        if self.title is None and self.description is None and self.is_check is None:
+            raise ValueError("更新する項目を1つ以上指定してください。")
+        return self
+
+
+# 一括更新で使用するスキーマ
+class BatchUpdateMemoSchema(BaseModel):
+    memos: list[BatchUpdateItemSchema] = Field(
+        ...,
+        description="更新するメモのリスト",
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+    )
+
+
+# 一括削除で使用するスキーマ
+class BatchDeleteMemoSchema(BaseModel):
+    memo_ids: list[int] = Field(
+        ...,
+        description="削除するメモのIDのリスト",
+        min_length=1,
+        max_length=BATCH_MAX_ITEMS,
+    )
+
+
+# 一括処理の1件分の結果スキーマ
+class BatchItemResultSchema(BaseModel):
+    # リクエスト内の位置
+    index: int
+    # 対象のメモID(登録時は採番されたID)
+    memo_id: int
+    status: Literal["created", "updated", "deleted", "not_found"] = Field(
+        ...,
+        description="処理結果(not_found: 該当ユーザーのメモが存在しない)",
+    )
+
+
+# 一括処理の結果スキーマ
+class BatchResponseSchema(BaseModel):
+    message: str
+    results: list[BatchItemResultSchema]
+
+
+# インポートでエラーになった行
+class MemoImportErrorSchema(BaseModel):
+    # 行番号(CSVはヘッダー行を1行目とした、レコードの開始行)
+    line: int
+    detail: str
+
+
+# インポートの結果スキーマ
+class MemoImportResultSchema(BaseModel):
+    processed: int = Field(..., description="読み込んだ行数(空行を除く)")
+    inserted: int = Field(..., description="登録したメモの件数")
+    failed: int = Field(..., description="エラーで登録しなかった行数")
+    errors: list[MemoImportErrorSchema] = Field(
+        ..., description="エラーの行(先頭から最大 MEMO_IMPORT_MAX_ERRORS 件)"
+    )
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+
+import uvicorn
+from sqlalchemy.engine import make_url
+
+from config import get_settings
+from db import DEFAULT_DATABASE_URL
+from state_server import StateServer
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# 本番用の起動コマンド(複数ワーカー)
+# 実行例(appディレクトリで実行)：
+#   python serve.py --workers 4
+#   SHARED_STATE_BACKEND=redis REDIS_URL=redis://redis:6379/0 python serve.py --workers 8
+# ============================================
+# ワーカーはそれぞれ別プロセスのため、設定(get_settings)・キャッシュ・レート制限・
+# 変更通知・失効リストはプロセスごとに持つ
+# 複数ワーカーの場合は共有状態のバックエンドをRedis互換サーバーにしてワーカー間で共有する
+# (SHARED_STATE_BACKEND=redis の指定が無ければ、このプロセス内でローカル用の
+# Redis互換サーバー(state_server.py)を起動して使用する)
+
+
+# ローカル用のRedis互換サーバーを別スレッドで起動し、URLを返す
+def start_state_server(host: str = "127.0.0.1") -> str:
+    server = StateServer(host=host)
+    started = threading.Event()
+
+    def run():
+        async def main():
+            await server.start()
+            started.set()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+    threading.Thread(target=run, name="state-server", daemon=True).start()
+    if not started.wait(timeout=10):
+        raise RuntimeError("共有状態サーバーの起動に失敗しました。")
+    return server.url
+
+
+def configure_shared_state(workers: int, shared_state: str) -> dict[str, str]:
+    """
+    共有状態のバックエンドを決定し、ワーカーに渡す環境変数を返す関数
+    Args:
+        workers(int): ワーカー数
+        shared_state(str): auto, memory, redis, local
+            auto: ワーカーが1つの場合はmemory、複数の場合はSHARED_STATE_BACKENDの設定が
+                redisならredis、それ以外はlocal
+            local: ローカル用のRedis互換サーバーを起動して使用
+    Returns:
+        dict[str, str]: 環境変数
+    """
+    settings = get_settings()
+    if shared_state == "auto":
+        if workers == 1:
+            shared_state = "memory"
+        elif settings.shared_state_backend == "redis":
+            shared_state = "redis"
+        else:
+            shared_state = "local"
+
+    if shared_state == "memory":
+        if workers > 1:
+            logger.warning(
+                "共有状態がワーカーごとのため、レート制限・キャッシュ・ログアウトの反映は"
+                "ワーカー単位になり、変更通知は他のワーカーの接続に届きません。"
+            )
+        return {"SHARED_STATE_BACKEND": "memory"}
+    if shared_state == "local":
+        url = start_state_server()
+        logger.info("ローカル用の共有状態サーバーを使用します。", extra={"url": url})
+        return {"SHARED_STATE_BACKEND": "redis", "REDIS_URL": url}
+    return {"SHARED_STATE_BACKEND": "redis"}
+
+
+# データベースが複数ワーカーで使用できるか確認
+def check_database(workers: int):
+    url = make_url(get_settings().database_url or DEFAULT_DATABASE_URL)
+    if workers == 1 or url.get_backend_name() != "sqlite":
+        return
+    if url.database in (None, "", ":memory:"):
+        raise SystemExit("インメモリのSQLiteは複数ワーカーで共有できません。")
+    # WALでも書き込みは同時に1つのため、ワーカー数を増やしても書き込みは速くならない
+    logger.warning(
+        "SQLiteの書き込みは同時に1接続のみのため、書き込みの多い環境では"
+        "PostgreSQL(DATABASE_URL)を使用してください。"
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="既定はCPU数"
+    )
+    parser.add_argument(
+        "--shared-state",
+        choices=("auto", "memory", "redis", "local"),
+        default="auto",
+        help="共有状態のバックエンド",
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers は1以上を指定してください。")
+
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr)
+    check_database(args.workers)
+    # ワーカーは環境変数を引き継いで起動する
+    os.environ.update(configure_shared_state(args.workers, args.shared_state))
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
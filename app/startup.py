@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import logging
+import time
+from datetime import timedelta
+
+import anyio.to_thread
+import jwt
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+import cruds.auth as auth_crud
+import cruds.memo as memo_crud
+from config import get_settings
+from hashing import hash_password
+from schemas.auth import DecodedTokenSchema
+import db
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# 起動時の初期化(ウォームアップ)
+# ============================================
+# 最初のリクエストで行われていた初期化(DB接続、ワーカーの起動、シリアライザーの
+# 初回実行等)を起動時にまとめて行い、完了するまで /readyz で準備中を返す
+# (完了前のワーカーにロードバランサーがリクエストを振り分けないようにする)
+
+
+# 起動処理の状態
+class StartupState:
+    def __init__(self):
+        # リクエストを受け付けられる状態か
+        self.ready = False
+        # 処理名 -> 所要時間(ミリ秒)
+        self.timings: dict[str, float] = {}
+
+
+state = StartupState()
+
+
+# コネクションプールに接続を作成しておく
+async def warm_up_db_pool(connections: int):
+    engine = db.get_engine()
+    if not isinstance(engine.pool, QueuePool):
+        # プールを使用しない場合(インメモリのSQLite等)は接続確認のみ
+        connections = min(connections, 1)
+    if connections <= 0:
+        return
+    # 同時に取得することで、プールに指定数のコネクションを作成させる
+    conns = await asyncio.gather(*(engine.connect() for _ in range(connections)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+
+# ミドルウェアの構築(通常は最初のASGIメッセージ(lifespan)の受信時に行われる)
+def build_middleware_stack(app: FastAPI):
+    if app.middleware_stack is None:
+        app.middleware_stack = app.build_middleware_stack()
+
+
+# 同期処理用のスレッドプールを起動しておく
+# (FastAPIは同期関数の依存関係・エンドポイントをスレッドで実行し、初回にanyioの
+# バックエンドの読み込みとスレッドの起動を行う)
+async def warm_up_threadpool():
+    await anyio.to_thread.run_sync(time.perf_counter)
+
+
+# ハッシュ化のワーカーを起動しておく(プロセスプールの場合は起動に時間がかかる)
+async def warm_up_hashing(workers: int):
+    await asyncio.gather(*(hash_password("warmup", b"warmup") for _ in range(workers)))
+
+
+# アクセストークンの生成・検証を1回実行しておく
+def warm_up_tokens():
+    token = auth_crud.create_access_token("warmup", 0, timedelta(minutes=1))
+    payload = jwt.decode(
+        token, get_settings().secret_key, algorithms=[auth_crud.ALGORITHM]
+    )
+    DecodedTokenSchema(username=payload["sub"], user_id=payload["id"])
+
+
+# ログアウト済みのトークンの読み込み(再起動前に失効したもの)
+async def load_revoked_sessions():
+    async with db.async_session() as db_session:
+        await auth_crud.load_revoked_sessions(db_session)
+
+
+# 処理を実行し、所要時間を記録
+async def _run_step(name: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    if inspect.isawaitable(result):
+        await result
+    state.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+async def warm_up(app: FastAPI):
+    """
+    起動時の初期化を行い、完了後にリクエストを受け付けられる状態にする関数
+    Args:
+        app(FastAPI): アプリ(OpenAPIのスキーマを生成しておく)
+    """
+    settings = get_settings()
+    start = time.perf_counter()
+    state.ready = False
+    state.timings = {}
+    connections = min(settings.db_warmup_connections, settings.db_pool_size)
+    await _run_step("middleware", build_middleware_stack, app)
+    await _run_step("db_pool", warm_up_db_pool, connections)
+    await _run_step("revoked_sessions", load_revoked_sessions)
+    await _run_step("threadpool", warm_up_threadpool)
+    await _run_step("hashing", warm_up_hashing, settings.password_hash_workers)
+    await _run_step("tokens", warm_up_tokens)
+    await _run_step("serializers", memo_crud.warm_up_serializers)
+    await _run_step("openapi", app.openapi)
+    state.timings["total"] = round((time.perf_counter() - start) * 1000, 2)
+    state.ready = True
+    logger.info("起動処理完了", extra={"timings_ms": state.timings})
@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# ローカル用のRedis互換サーバー(共有状態の代替)
+# ============================================
+# 1台のマシンで複数ワーカーを実行する場合に、Redisを用意せずにキャッシュ・
+# レート制限・変更通知をワーカー間で共有するための最小限の実装
+# アプリのRedisバックエンドが使用するコマンドのみ対応(RESP2, RESP3)
+# データはメモリ上のみで保持し、永続化・レプリケーションは行わない
+# (複数台のサーバーで共有する場合は実際のRedisを使用する)
+
+# 期限切れのキーをまとめて削除する間隔(秒)
+PURGE_INTERVAL = 1.0
+
+
+class CommandError(Exception):
+    pass
+
+
+# ストリーム(XADD/XREAD)のエントリーID
+def _parse_stream_id(value: bytes, default_seq: int) -> tuple[int, int]:
+    millis, _, seq = value.decode().partition("-")
+    try:
+        return int(millis), int(seq) if seq else default_seq
+    except ValueError:
+        raise CommandError("ERR Invalid stream ID specified as stream command argument")
+
+
+def _format_stream_id(entry_id: tuple[int, int]) -> bytes:
+    return f"{entry_id[0]}-{entry_id[1]}".encode()
+
+
+class _Stream:
+    def __init__(self):
+        # (ID, [フィールド, 値, ...]) のリスト(古い順)
+        self.entries: deque[tuple[tuple[int, int], list[bytes]]] = deque()
+        self.last_id = (0, 0)
+
+
+# ============================================
+# RESPのエンコード
+# ============================================
+# resp3: 接続時の HELLO 3 でRESP3を指定された場合(dictはマップとして送信)
+def _encode(value, resp3: bool = False) -> bytes:
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, CommandError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        # 単純な文字列(+OK 等)
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(
+            _encode(item, resp3) for item in value
+        )
+    if isinstance(value, dict):
+        if not resp3:
+            # RESP2 ではキーと値の組の配列(XREADの形式)
+            return _encode([list(pair) for pair in value.items()])
+        return b"%%%d\r\n" % len(value) + b"".join(
+            _encode(key, resp3) + _encode(item, resp3) for key, item in value.items()
+        )
+    raise TypeError(type(value))
+
+
+# 配列(クライアントからのコマンド)の読み込み
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # インラインコマンド(redis-cli等の簡易形式)
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        length = int(header[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+# ============================================
+# サーバー
+# ============================================
+class StateServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            host(str): 待ち受けるアドレス(外部に公開しないこと、認証は行わない)
+            port(int): 待ち受けるポート番号(0の場合は空いているポート)
+        """
+        self.host = host
+        self.port = port
+        # キー -> 値(bytes) または ストリーム
+        self._data: dict[bytes, bytes | _Stream] = {}
+        # キー -> 有効期限(time.monotonic()基準)
+        self._expires: dict[bytes, float] = {}
+        # ストリームのキー -> 追加の通知(XREAD BLOCK で待機中の読み込みを起こす)
+        self._added: dict[bytes, asyncio.Event] = {}
+        self._server: asyncio.Server | None = None
+        self._purge_task: asyncio.Task | None = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._purge_task = asyncio.create_task(self._purge_loop())
+        logger.info("共有状態サーバー起動", extra={"url": self.url})
+
+    async def stop(self):
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # 接続ごとの処理(コマンドを順に実行し、パイプラインの応答はまとめて送信)
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        resp3 = False
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    if args[0].upper() == b"HELLO":
+                        resp3, result = self._hello(args[1:], resp3)
+                    else:
+                        result = await self._execute(args)
+                except CommandError as e:
+                    result = e
+                writer.write(_encode(result, resp3))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _execute(self, args: list[bytes]):
+        name = args[0].decode().upper()
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"ERR unknown command '{name}'")
+        result = handler(*args[1:])
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    # ============================================
+    # キーの有効期限
+    # ============================================
+    def _alive(self, key: bytes) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+        return key in self._data
+
+    def _remove(self, key: bytes) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(PURGE_INTERVAL)
+            now = time.monotonic()
+            for key in [key for key, at in self._expires.items() if at <= now]:
+                self._remove(key)
+
+    def _get_value(self, key: bytes) -> bytes | None:
+        if not self._alive(key):
+            return None
+        value = self._data[key]
+        if isinstance(value, _Stream):
+            raise CommandError(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        return value
+
+    def _get_stream(self, key: bytes, create: bool = False) -> _Stream | None:
+        if not self._alive(key):
+            if not create:
+                return None
+            self._data[key] = _Stream()
+        stream = self._data[key]
+        if not isinstance(stream, _Stream):
+            raise CommandError(
+                "WRONGTYPE Operation against a key holding the wrong kind of value"
+            )
+        return stream
+
+    # ============================================
+    # 接続・サーバー
+    # ============================================
+    # HELLO [protover]: プロトコルの切り替え(AUTH等のオプションは未対応)
+    @staticmethod
+    def _hello(args: list[bytes], resp3: bool) -> tuple[bool, dict]:
+        if args:
+            if args[0] not in (b"2", b"3"):
+                raise CommandError("NOPROTO unsupported protocol version")
+            resp3 = args[0] == b"3"
+        info = {
+            b"server": b"redis",
+            b"version": b"7.0.0",
+            b"proto": 3 if resp3 else 2,
+            b"mode": b"standalone",
+            b"role": b"master",
+            b"modules": [],
+        }
+        # RESP2 では項目名と値を交互に並べた配列
+        return resp3, info if resp3 else [v for pair in info.items() for v in pair]
+
+    def _cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    # CLIENT SETINFO 等(接続時にクライアントライブラリが送信する)
+    def _cmd_client(self, *args):
+        return "OK"
+
+    def _cmd_select(self, index: bytes):
+        if index != b"0":
+            raise CommandError("ERR DB index is out of range")
+        return "OK"
+
+    def _cmd_flushall(self, *args):
+        self._data.clear()
+        self._expires.clear()
+        return "OK"
+
+    def _cmd_dbsize(self):
+        return sum(1 for key in list(self._data) if self._alive(key))
+
+    # ============================================
+    # 文字列・カウンター
+    # ============================================
+    def _cmd_get(self, key: bytes):
+        return self._get_value(key)
+
+    def _cmd_set(self, key: bytes, value: bytes, *options: bytes):
+        ttl = None
+        nx = xx = False
+        options = [option.upper() for option in options]
+        i = 0
+        while i < len(options):
+            option = options[i]
+            if option in (b"EX", b"PX") and i + 1 < len(options):
+                ttl = int(options[i + 1]) / (1 if option == b"EX" else 1000)
+                i += 1
+            elif option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            else:
+                raise CommandError("ERR syntax error")
+            i += 1
+        exists = self._alive(key)
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._data[key] = value
+        if ttl is not None:
+            self._expires[key] = time.monotonic() + ttl
+        else:
+            self._expires.pop(key, None)
+        return "OK"
+
+    def _cmd_del(self, *keys: bytes):
+        return sum(self._remove(key) for key in keys if self._alive(key))
+
+    def _cmd_incrby(self, key: bytes, amount: bytes):
+        value = self._get_value(key)
+        try:
+            number = int(value or 0) + int(amount)
+        except ValueError:
+            raise CommandError("ERR value is not an integer or out of range")
+        # 有効期限は維持する
+        self._data[key] = str(number).encode()
+        return number
+
+    def _cmd_incr(self, key: bytes):
+        return self._cmd_incrby(key, b"1")
+
+    def _cmd_pexpire(self, key: bytes, millis: bytes):
+        if not self._alive(key):
+            return 0
+        self._expires[key] = time.monotonic() + int(millis) / 1000
+        return 1
+
+    def _cmd_expire(self, key: bytes, seconds: bytes):
+        return self._cmd_pexpire(key, str(int(seconds) * 1000).encode())
+
+    def _cmd_pttl(self, key: bytes):
+        if not self._alive(key):
+            return -2
+        expires = self._expires.get(key)
+        if expires is None:
+            return -1
+        return max(0, int((expires - time.monotonic()) * 1000))
+
+    # ============================================
+    # ストリーム(変更通知)
+    # ============================================
+    def _cmd_xadd(self, key: bytes, *args: bytes):
+        args = list(args)
+        maxlen = None
+        if args and args[0].upper() == b"MAXLEN":
+            # MAXLEN [~|=] N(~ の場合も正確に切り詰める)
+            index = 2 if args[1] in (b"~", b"=") else 1
+            maxlen = int(args[index])
+            args = args[index + 1 :]
+        if len(args) < 3 or len(args) % 2 == 0:
+            raise CommandError("ERR wrong number of arguments for 'xadd' command")
+        stream = self._get_stream(key, create=True)
+        if args[0] == b"*":
+            millis = int(time.time() * 1000)
+            last_millis, last_seq = stream.last_id
+            entry_id = (
+                (millis, 0) if millis > last_millis else (last_millis, last_seq + 1)
+            )
+        else:
+            entry_id = _parse_stream_id(args[0], 0)
+            if entry_id <= stream.last_id:
+                raise CommandError(
+                    "ERR The ID specified in XADD is equal or smaller than the "
+                    "target stream top item"
+                )
+        stream.entries.append((entry_id, args[1:]))
+        stream.last_id = entry_id
+        if maxlen is not None:
+            while len(stream.entries) > maxlen:
+                stream.entries.popleft()
+        added = self._added.pop(key, None)
+        if added is not None:
+            added.set()
+        return _format_stream_id(entry_id)
+
+    def _range(
+        self, key: bytes, start: bytes, end: bytes, count: int | None, reverse: bool
+    ) -> list:
+        stream = self._get_stream(key)
+        if stream is None:
+            return []
+        low = (0, 0) if start == b"-" else _parse_stream_id(start, 0)
+        high = (2**63, 2**63) if end == b"+" else _parse_stream_id(end, 2**63)
+        entries = reversed(stream.entries) if reverse else stream.entries
+        result = []
+        for entry_id, fields in entries:
+            if low <= entry_id <= high:
+                result.append([_format_stream_id(entry_id), fields])
+                if count is not None and len(result) >= count:
+                    break
+        return result
+
+    @staticmethod
+    def _parse_count(args: tuple[bytes, ...]) -> int | None:
+        if len(args) == 2 and args[0].upper() == b"COUNT":
+            return int(args[1])
+        if args:
+            raise CommandError("ERR syntax error")
+        return None
+
+    def _cmd_xrange(self, key: bytes, start: bytes, end: bytes, *args: bytes):
+        return self._range(key, start, end, self._parse_count(args), reverse=False)
+
+    def _cmd_xrevrange(self, key: bytes, end: bytes, start: bytes, *args: bytes):
+        return self._range(key, start, end, self._parse_count(args), reverse=True)
+
+    # XREAD [COUNT n] [BLOCK ms] STREAMS key [key ...] id [id ...]
+    async def _cmd_xread(self, *args: bytes):
+        args = list(args)
+        count = block = None
+        while args and args[0].upper() in (b"COUNT", b"BLOCK"):
+            if args[0].upper() == b"COUNT":
+                count = int(args[1])
+            else:
+                block = int(args[1])
+            args = args[2:]
+        if not args or args[0].upper() != b"STREAMS" or len(args) % 2 == 0:
+            raise CommandError("ERR syntax error")
+        half = (len(args) - 1) // 2
+        keys, ids = args[1 : 1 + half], args[1 + half :]
+        positions = []
+        for key, position in zip(keys, ids):
+            stream = self._get_stream(key)
+            if position == b"$":
+                positions.append(stream.last_id if stream else (0, 0))
+            else:
+                positions.append(_parse_stream_id(position, 0))
+
+        deadline = None if not block else time.monotonic() + block / 1000
+        while True:
+            result = {}
+            waiters = []
+            for key, position in zip(keys, positions):
+                stream = self._get_stream(key)
+                entries = [
+                    [_format_stream_id(entry_id), fields]
+                    for entry_id, fields in (stream.entries if stream else ())
+                    if entry_id > position
+                ][:count]
+                if entries:
+                    result[key] = entries
+                waiters.append(self._added.setdefault(key, asyncio.Event()))
+            if result or block is None:
+                return result or None
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return None
+            # いずれかのストリームに追加されるまで待機
+            tasks = [asyncio.ensure_future(event.wait()) for event in waiters]
+            try:
+                await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+
+# 単独で実行する場合(例: python -m state_server --port 6390)
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(StateServer(args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass